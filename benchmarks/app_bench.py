@@ -0,0 +1,431 @@
+"""End-to-end rerun cost of the reviewer UI, measured headlessly with AppTest.
+
+Usage:
+    python -m benchmarks.app_bench [--scenarios small medium large] [--store journal]
+                                   [--output app_bench.json] [--thresholds benchmarks/thresholds.json]
+                                   [--baseline previous.json] [--tolerance 0.25]
+
+Each scenario generates a synthetic catalog and stored responses in a scratch
+directory, then drives app.py, st_research.py and the admin and analytics
+pages through `streamlit.testing.v1.AppTest` in a fresh process, so caches
+start cold and peak RSS belongs to that scenario alone:
+
+    small    100 papers,     1.1k answers (every paper answered once)
+    medium   1k papers,      100k answers (spread over 10 reviewers)
+    large    10k papers,     1M answers   (spread over 10 reviewers)
+
+PDFs are served by a local HTTP stand-in, with an optional delay, so fetches
+go through the real PDF cache without touching the network.
+
+Measured per scenario, in seconds unless the name says otherwise: first load
+of a session with cold and warm server caches, opening a paper (until the
+questions are usable, and until its PDF has been downloaded and shown) and
+switching back to it, answer reruns (p50/p95 time and p50 KB sent to the
+browser), an explicit save, the answers export over every reviewer, admin and
+analytics page loads, and peak RSS. The per-stage timings of modules.metrics
+are recorded alongside.
+
+Results are written as JSON. A metric above its ceiling in the thresholds
+file, or more than `tolerance` slower than in a baseline results file, is a
+regression, and the run exits with status 1.
+"""
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    # Scenarios run in a scratch working directory
+    sys.path.insert(0, REPO_ROOT)
+
+from modules.config import CONFIG_PATH, QuestionSchema
+from modules.data_handler import question_payload
+from modules.storage import (
+    DEFAULT_REVIEWER,
+    RESPONSES_DB,
+    RESPONSES_DIR,
+    RESPONSES_FILE,
+    ShardedJournalStore,
+    SQLiteStore,
+)
+
+SCENARIOS = {
+    "small": {"papers": 100, "answers": 1_100},
+    "medium": {"papers": 1_000, "answers": 100_000},
+    "large": {"papers": 10_000, "answers": 1_000_000},
+}
+DEFAULT_THRESHOLDS = os.path.join(REPO_ROOT, "benchmarks", "thresholds.json")
+# Baseline comparisons ignore differences below this many seconds
+MIN_REGRESSION = 0.005
+WORDS = (
+    "attention transformer protein structure model baseline dataset ablation results method "
+    "significant sample training evaluation benchmark limitation future work novel approach "
+    "experiment hypothesis analysis accuracy robust generalization metric clinical cohort"
+).split()
+
+
+# --- Synthetic data ---
+
+@functools.lru_cache(maxsize=None)
+def make_pdf(label, pages, size_kb):
+    """Return a valid PDF of `pages` pages, padded to about `size_kb` KB."""
+    padding = b"%" + b"x" * max(size_kb * 1024 // pages - 2, 0) + b"\n"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(pages))}] /Count {pages} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        content = padding + f"BT /F1 24 Tf 72 720 Td ({label} - page {i + 1}) Tj ET".encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+class PDFServer(ThreadingHTTPServer):
+    """Local stand-in for PDF hosts serving /papers/<id>.pdf with ETags."""
+
+    daemon_threads = True
+
+    def __init__(self, pages, size_kb, latency):
+        super().__init__(("127.0.0.1", 0), PDFRequestHandler)
+        self.pages = pages
+        self.size_kb = size_kb
+        self.latency = latency
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class PDFRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        name = self.path.rsplit("/", 1)[-1]
+        if not (self.path.startswith("/papers/") and name.endswith(".pdf")):
+            self.send_error(404)
+            return
+        time.sleep(server.latency)
+        body = make_pdf(name[:-4], server.pages, server.size_kb)
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def synthetic_answer(question, rng):
+    if question["type"] == "multiple_choice":
+        return rng.choice(question["options"])
+    if question["type"] == "rating":
+        return rng.randint(question["min"], question["max"])
+    return " ".join(rng.choices(WORDS, k=rng.randint(5, 40)))
+
+
+def write_scenario(directory, papers, answers, store_kind, pdf_base_url):
+    """Write papers_config.json and the stored responses of a scenario; return its reviewers."""
+    with open(os.path.join(REPO_ROOT, CONFIG_PATH), 'r') as f:
+        question_templates = json.load(f)["question_templates"]
+    catalog = [
+        {
+            "id": i,
+            "title": f"Synthetic paper {i}: {' '.join(random.Random(i).choices(WORDS, k=6))}",
+            "pdf_url": f"{pdf_base_url}/papers/{i}.pdf",
+            "local_pdf": None,
+        }
+        # Paper ids start at 1, like the shipped catalog
+        for i in range(1, papers + 1)
+    ]
+    with open(os.path.join(directory, CONFIG_PATH), 'w') as f:
+        json.dump({"papers": catalog, "question_templates": question_templates}, f, indent=2)
+
+    questions = QuestionSchema(question_templates).questions
+    payload = [question_payload(q) for q in questions]
+    if store_kind == "journal":
+        store = ShardedJournalStore(os.path.join(directory, RESPONSES_FILE), os.path.join(directory, RESPONSES_DIR))
+    else:
+        store = SQLiteStore(os.path.join(directory, RESPONSES_DB))
+
+    rng = random.Random(0)
+    reviewers = []
+    remaining = answers
+    while remaining >= len(questions):
+        reviewer = DEFAULT_REVIEWER if not reviewers else f"reviewer-{len(reviewers)}"
+        count = min(papers, remaining // len(questions))
+        responses = {
+            str(paper["id"]): {
+                "paper_id": paper["id"],
+                "paper_title": paper["title"],
+                "responses": {str(q["id"]): synthetic_answer(q, rng) for q in questions},
+                "questions": payload,
+                "timestamp": "2024-01-01 00:00:00",
+                "completed": True,
+                "version": 1,
+            }
+            for paper in catalog[:count]
+        }
+        store.save_all(responses, reviewer)
+        reviewers.append(reviewer)
+        remaining -= count * len(questions)
+    return reviewers
+
+
+# --- Measurements (run in a fresh process per scenario) ---
+
+def run_app(at):
+    """Run an AppTest script once and return the wall time, failing on any exception."""
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(f"{at._script_path}: {at.exception[0].message}")
+    return elapsed
+
+
+def run_until_pdf_shown(at, poll=0.05):
+    """Run until the PDF placeholder is gone; return (first run, total) wall times.
+
+    Papers whose PDF is not cached yet first show a placeholder while the
+    download runs in the background; the browser would poll it, here the
+    script is rerun until the document replaces it.
+    """
+    started = time.perf_counter()
+    first = run_app(at)
+    while any(info.icon == "⏳" for info in at.info):
+        time.sleep(poll)
+        run_app(at)
+    return first, time.perf_counter() - started
+
+
+def measure(directory, args):
+    """Drive every script against the scenario in `directory`; return (metrics, stages)."""
+    os.chdir(directory)
+    os.environ["RESPONSE_STORE"] = args.store
+
+    from streamlit.testing.v1 import AppTest
+
+    from modules.export import ANSWER_COLUMNS, export_to_tempfile, iter_answer_rows
+    from modules.metrics import registry
+    from modules.storage import create_store
+
+    # AppTest sets session state outside a script run, which Streamlit warns about
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda record: "missing ScriptRunContext" not in record.getMessage()
+    )
+
+    def app_test(script):
+        return AppTest.from_file(os.path.join(REPO_ROOT, script), default_timeout=args.timeout)
+
+    metrics = {}
+    at = app_test("app.py")
+    metrics["app_first_load_s"] = run_app(at)
+    at.sidebar.button(key="paper_btn_1").click()
+    metrics["app_open_paper_interactive_s"], metrics["app_open_paper_s"] = run_until_pdf_shown(at)
+    at.sidebar.button(key="paper_btn_2").click()
+    run_until_pdf_shown(at)
+    at.sidebar.button(key="paper_btn_1").click()
+    metrics["app_switch_paper_s"] = run_app(at)
+
+    text_areas = at.text_area
+    reruns = []
+    for n in range(args.interactions):
+        text_areas[n % len(text_areas)].input(f"benchmark answer {n}")
+        reruns.append(run_app(at))
+        text_areas = at.text_area
+    reruns.sort()
+    metrics["app_answer_rerun_p50_s"] = statistics.median(reruns)
+    metrics["app_answer_rerun_p95_s"] = reruns[min(len(reruns) - 1, int(len(reruns) * 0.95))]
+    sent = registry.histograms.get("rerun_sent_bytes")
+    if sent is not None:
+        metrics["app_answer_rerun_sent_kb_p50"] = statistics.median(list(sent.recent)[-args.interactions:]) / 1024
+    at.button(key="save_progress_1").click()
+    metrics["app_save_s"] = run_app(at)
+
+    metrics["app_warm_first_load_s"] = run_app(app_test("app.py"))
+
+    at = app_test("st_research.py")
+    metrics["research_first_load_s"] = run_app(at)
+    at.sidebar.button(key="paper_btn_1").click()
+    metrics["research_open_paper_s"] = run_until_pdf_shown(at)[1]
+
+    for page in ("admin", "analytics"):
+        at = app_test(os.path.join("pages", f"{page}.py"))
+        at.session_state["admin_logged_in"] = True
+        metrics[f"{page}_load_s"] = run_app(at)
+
+    started = time.perf_counter()
+    with export_to_tempfile(iter_answer_rows(create_store().iter_records()), "csv", ANSWER_COLUMNS) as f:
+        metrics["export_answers_csv_s"] = time.perf_counter() - started
+        metrics["export_answers_csv_mb"] = os.fstat(f.fileno()).st_size / 1024 ** 2
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    metrics["peak_rss_mb"] = peak_rss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+    return metrics, registry.summary()
+
+
+def _run_measure(queue, directory, args):
+    try:
+        queue.put(("ok", measure(directory, args)))
+    except Exception as e:
+        queue.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def run_scenario(name, args, server):
+    """Generate a scenario, measure it in a child process and return its results."""
+    spec = SCENARIOS[name]
+    directory = tempfile.mkdtemp(prefix=f"app-bench-{name}-")
+    try:
+        started = time.perf_counter()
+        reviewers = write_scenario(directory, spec["papers"], spec["answers"], args.store, server.base_url)
+        generated = time.perf_counter() - started
+
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        requests_before = server.requests
+        process = context.Process(target=_run_measure, args=(queue, directory, args))
+        process.start()
+        status, value = queue.get()
+        process.join()
+        if status == "error":
+            raise RuntimeError(f"scenario {name}: {value}")
+        metrics, stages = value
+        return {
+            **spec,
+            "reviewers": len(reviewers),
+            "generate_s": generated,
+            "pdf_requests": server.requests - requests_before,
+            "metrics": metrics,
+            "stages": stages,
+        }
+    finally:
+        if args.keep:
+            print(f"  scenario kept in {directory}")
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+# --- Regressions ---
+
+def check_thresholds(results, thresholds):
+    """Return the metrics above their ceilings, as messages."""
+    violations = []
+    for name, scenario in results["scenarios"].items():
+        for metric, ceiling in thresholds.get(name, {}).items():
+            value = scenario["metrics"].get(metric)
+            if value is not None and value > ceiling:
+                violations.append(f"{name}.{metric} = {value:.3f} exceeds the threshold of {ceiling}")
+    return violations
+
+
+def check_baseline(results, baseline, tolerance):
+    """Return the timings more than `tolerance` slower than in a baseline run, as messages."""
+    violations = []
+    for name, scenario in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name, {}).get("metrics", {})
+        for metric, value in scenario["metrics"].items():
+            before = previous.get(metric)
+            if before is None or not metric.endswith("_s"):
+                continue
+            if value > before * (1 + tolerance) and value - before > MIN_REGRESSION:
+                violations.append(f"{name}.{metric} = {value:.3f} regressed from {before:.3f} (+{value / before - 1:.0%})")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure end-to-end rerun cost of the reviewer UI with AppTest.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--store", choices=["journal", "sqlite"], default="journal")
+    parser.add_argument("--interactions", type=int, default=20, help="Answer reruns measured per scenario")
+    parser.add_argument("--pdf-pages", type=int, default=12, help="Pages per served PDF")
+    parser.add_argument("--pdf-kb", type=int, default=512, help="Approximate size of each served PDF")
+    parser.add_argument("--pdf-latency", type=float, default=0.0, help="Seconds the PDF stand-in waits per request")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds allowed for a single script run")
+    parser.add_argument("--output", default="app_bench.json", help="Results file")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="JSON file of metric ceilings per scenario")
+    parser.add_argument("--baseline", help="Previous results file to compare timings against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown relative to the baseline")
+    parser.add_argument("--keep", action="store_true", help="Keep the scenario directories for inspection")
+    args = parser.parse_args()
+
+    import streamlit
+
+    server = PDFServer(args.pdf_pages, args.pdf_kb, args.pdf_latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "platform": platform.platform(),
+        "store": args.store,
+        "scenarios": {},
+    }
+    try:
+        for name in args.scenarios:
+            print(f"{name}: {SCENARIOS[name]['papers']} papers, {SCENARIOS[name]['answers']} answers")
+            scenario = results["scenarios"][name] = run_scenario(name, args, server)
+            for metric, value in scenario["metrics"].items():
+                print(f"  {metric:<28} {value:10.3f}")
+    finally:
+        server.shutdown()
+
+    violations = []
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds, 'r') as f:
+            violations += check_thresholds(results, json.load(f))
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            violations += check_baseline(results, json.load(f), args.tolerance)
+    results["violations"] = violations
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+    for violation in violations:
+        print(f"REGRESSION: {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Size and speed of the compact response encoding against the plain JSON layout.
+
+Usage:
+    python -m benchmarks.encoding_bench [--answers 1000000] [--reviewers 1] [--keep]
+
+Builds synthetic records for the shipped question set, like benchmarks.app_bench,
+and stores them once as the plain indented JSON snapshots written before the
+compact encoding and once as compact snapshots. Reported per layout: file
+size, snapshot write time and the time JournalStore.load_all takes to read it
+back, plus the size of one journal record. The compact files must load back
+to exactly the records that were written; the run exits with status 1
+otherwise.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.app_bench import REPO_ROOT, synthetic_answer
+from modules.config import CONFIG_PATH, QuestionSchema
+from modules.data_handler import question_payload
+from modules.encoding import ORJSON_AVAILABLE, SchemaTable, dumps, encode_record, encode_snapshot
+from modules.storage import SCHEMAS_SUFFIX, JournalStore, atomic_write_bytes, atomic_write_json
+
+
+def build_records(answers, reviewers):
+    """Return [{paper_id: record}] per reviewer, holding `answers` answers in total."""
+    with open(os.path.join(REPO_ROOT, CONFIG_PATH), 'r') as f:
+        question_templates = json.load(f)["question_templates"]
+    questions = QuestionSchema(question_templates).questions
+    rng = random.Random(0)
+    papers = answers // len(questions) // reviewers
+    shards = []
+    for reviewer in range(reviewers):
+        # Records built by the app hold their own copy of the question list
+        shards.append({
+            str(paper_id): {
+                "paper_id": paper_id,
+                "paper_title": f"Synthetic paper {paper_id}",
+                "responses": {
+                    (f"q_{q['id']}" if reviewer % 2 else str(q["id"])): synthetic_answer(q, rng)
+                    for q in questions
+                },
+                "questions": [question_payload(q) for q in questions],
+                "timestamp": "2024-01-01 00:00:00",
+                "completed": True,
+                "version": 1,
+            }
+            for paper_id in range(1, papers + 1)
+        })
+    return shards
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def measure(directory, shards):
+    results = {"plain": {"bytes": 0, "write_s": 0.0, "load_s": 0.0},
+               "compact": {"bytes": 0, "write_s": 0.0, "load_s": 0.0}}
+    lossless = True
+    for i, records in enumerate(shards):
+        plain = os.path.join(directory, f"plain-{i}.json")
+        elapsed, _ = timed(lambda: atomic_write_json(plain, records, indent=2))
+        results["plain"]["write_s"] += elapsed
+        results["plain"]["bytes"] += os.path.getsize(plain)
+        elapsed, loaded = timed(JournalStore(plain).load_all)
+        results["plain"]["load_s"] += elapsed
+        del loaded
+
+        compact = os.path.join(directory, f"compact-{i}.json")
+        schemas = SchemaTable(compact + SCHEMAS_SUFFIX)
+        elapsed, _ = timed(lambda: atomic_write_bytes(compact, encode_snapshot(records, schemas)))
+        results["compact"]["write_s"] += elapsed
+        results["compact"]["bytes"] += os.path.getsize(compact) + os.path.getsize(compact + SCHEMAS_SUFFIX)
+        elapsed, loaded = timed(JournalStore(compact).load_all)
+        results["compact"]["load_s"] += elapsed
+        lossless = lossless and loaded == records
+        del loaded
+
+    record = next(iter(shards[0].values()))
+    entry = {"reviewer": "default", "paper_id": "1"}
+    results["plain"]["journal_record_bytes"] = len(json.dumps(dict(entry, record=record), separators=(',', ':')))
+    schemas = SchemaTable(os.path.join(directory, "journal" + SCHEMAS_SUFFIX))
+    results["compact"]["journal_record_bytes"] = len(dumps(dict(entry, record=encode_record(record, schemas))))
+    return results, lossless
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the compact response encoding with the plain JSON layout.")
+    parser.add_argument("--answers", type=int, default=1_000_000, help="Answers across all reviewers")
+    parser.add_argument("--reviewers", type=int, default=1, help="Shards the answers are spread over")
+    parser.add_argument("--keep", action="store_true", help="Keep the written files for inspection")
+    args = parser.parse_args()
+
+    shards = build_records(args.answers, args.reviewers)
+    directory = tempfile.mkdtemp(prefix="encoding-bench-")
+    try:
+        results, lossless = measure(directory, shards)
+    finally:
+        if args.keep:
+            print(f"files kept in {directory}")
+        else:
+            shutil.rmtree(directory)
+
+    records = sum(len(records) for records in shards)
+    print(f"{records} records, {args.answers} answers, {args.reviewers} shard(s), "
+          f"codec: {'orjson' if ORJSON_AVAILABLE else 'json'}")
+    for layout, values in results.items():
+        print(f"  {layout:<8} {values['bytes'] / 1024 ** 2:8.1f} MB   write {values['write_s']:6.2f}s   "
+              f"load {values['load_s']:6.2f}s   journal record {values['journal_record_bytes']} B")
+    plain, compact = results["plain"], results["compact"]
+    print(f"  compact/plain: size {compact['bytes'] / plain['bytes']:.2f}, write {compact['write_s'] / plain['write_s']:.2f}, "
+          f"load {compact['load_s'] / plain['load_s']:.2f}")
+    print(f"  lossless: {'yes' if lossless else 'NO'}")
+    return 0 if lossless else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
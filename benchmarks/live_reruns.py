@@ -0,0 +1,219 @@
+"""Per-interaction rerun cost against a live Streamlit server.
+
+Usage:
+    python -m benchmarks.live_reruns [--scripts app.py st_research.py] [--pdf-kb 20480]
+                                     [--interactions 20] [--no-static-serving]
+                                     [--output live_reruns.json]
+
+AppTest always reruns the whole script, so it cannot show what fragments
+save. This harness starts `streamlit run` on a small synthetic scenario and
+talks to it over the websocket like a browser would: it opens a paper, whose
+PDF is served by the local stand-in of benchmarks.app_bench, then types into
+the question text areas one at a time. Each interaction is sent with the
+fragment id of its widget, so the server reruns only that fragment when the
+widget lives in one.
+
+Reported per script: the time and websocket bytes of opening the paper,
+polling its download placeholder like the browser does until the document
+is shown, and,
+for the answer interactions, p50/p95 time and p50 bytes until the server
+reports the run finished. With the repo's config, PDFs are delivered by URL
+from the static directory; pass --no-static-serving to measure the fallback
+that sends the document over the websocket.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from websockets.sync.client import connect
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from benchmarks.app_bench import REPO_ROOT, PDFServer, write_scenario
+
+FINISHED = (
+    ForwardMsg.ScriptFinishedStatus.FINISHED_SUCCESSFULLY,
+    ForwardMsg.ScriptFinishedStatus.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+)
+# Seconds between polls of a PDF download placeholder
+POLL_INTERVAL = 0.1
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(script, directory, port, timeout, static_serving=True):
+    """Start `streamlit run` on a script with `directory` as working directory."""
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", os.path.join(REPO_ROOT, script),
+            "--server.headless=true",
+            "--server.address=127.0.0.1",
+            f"--server.port={port}",
+            f"--server.enableStaticServing={str(static_serving).lower()}",
+            "--server.fileWatcherType=none",
+            "--browser.gatherUsageStats=false",
+        ],
+        cwd=directory,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"streamlit did not start serving {script}")
+
+
+class Session:
+    """A browser stand-in: sends reruns and tracks the widgets it was sent."""
+
+    def __init__(self, ws, timeout):
+        self.ws = ws
+        self.timeout = timeout
+        # widget key -> (widget id, fragment id, element type)
+        self.widgets = {}
+        # Fragment id of the PDF download placeholder drawn by the last run
+        self.placeholder = None
+
+    def rerun(self, widget=None, fragment_id=""):
+        """Send a rerun and return (seconds, bytes received) once the run has finished."""
+        msg = BackMsg()
+        msg.rerun_script.fragment_id = fragment_id
+        if widget is not None:
+            msg.rerun_script.widget_states.widgets.append(widget)
+        started = time.perf_counter()
+        self.placeholder = None
+        self.ws.send(msg.SerializeToString())
+        received = 0
+        while True:
+            data = self.ws.recv(timeout=self.timeout)
+            received += len(data)
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                self._track(forward.delta)
+            elif kind == "script_finished" and forward.script_finished in FINISHED:
+                return time.perf_counter() - started, received
+
+    def _track(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        field = element.WhichOneof("type")
+        if field == "alert" and element.alert.icon == "⏳":
+            self.placeholder = delta.fragment_id
+        widget = getattr(element, field, None)
+        widget_id = getattr(widget, "id", "")
+        if widget_id.startswith("$$ID-"):
+            # Ids end with the widget's user key
+            key = widget_id.split("-", 2)[-1]
+            self.widgets[key] = (widget_id, delta.fragment_id, field)
+
+    def click(self, key):
+        widget_id, fragment_id, _ = self.widgets[key]
+        return self.rerun(WidgetState(id=widget_id, trigger_value=True), fragment_id)
+
+    def type_text(self, key, text):
+        widget_id, fragment_id, _ = self.widgets[key]
+        return self.rerun(WidgetState(id=widget_id, string_value=text), fragment_id)
+
+    def wait_for_pdf(self, elapsed, received):
+        """Poll a PDF download placeholder until it is replaced; add to (seconds, bytes)."""
+        while self.placeholder is not None:
+            time.sleep(POLL_INTERVAL)
+            poll_s, poll_bytes = self.rerun(fragment_id=self.placeholder)
+            elapsed += POLL_INTERVAL + poll_s
+            received += poll_bytes
+        return elapsed, received
+
+
+def measure(script, directory, args):
+    port = free_port()
+    process = start_server(script, directory, port, args.timeout, args.static_serving)
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    try:
+        with connect(url, subprotocols=["streamlit"], max_size=None) as ws:
+            session = Session(ws, args.timeout)
+            session.rerun()
+            open_s, open_bytes = session.wait_for_pdf(*session.click("paper_btn_1"))
+            text_keys = sorted(
+                key for key, (_, _, field) in session.widgets.items()
+                if key.startswith("paper_1_") and field == "text_area"
+            )
+            times, sizes = [], []
+            for n in range(args.interactions):
+                key = text_keys[n % len(text_keys)]
+                elapsed, received = session.type_text(key, f"benchmark answer {n}")
+                times.append(elapsed)
+                sizes.append(received)
+    finally:
+        process.terminate()
+        process.wait()
+    times.sort()
+    return {
+        "open_paper_s": open_s,
+        "open_paper_kb": open_bytes / 1024,
+        "answer_rerun_p50_s": statistics.median(times),
+        "answer_rerun_p95_s": times[min(len(times) - 1, int(len(times) * 0.95))],
+        "answer_rerun_kb_p50": statistics.median(sizes) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-interaction reruns against a live Streamlit server.")
+    parser.add_argument("--scripts", nargs="+", default=["app.py", "st_research.py"])
+    parser.add_argument("--papers", type=int, default=100)
+    parser.add_argument("--interactions", type=int, default=20, help="Answer reruns measured per script")
+    parser.add_argument("--pdf-pages", type=int, default=12, help="Pages of the served PDF")
+    parser.add_argument("--pdf-kb", type=int, default=20 * 1024, help="Approximate size of the served PDF")
+    parser.add_argument("--no-static-serving", dest="static_serving", action="store_false",
+                        help="Send PDFs over the websocket instead of by static URL")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for the server or a run")
+    parser.add_argument("--output", default="live_reruns.json", help="Results file")
+    args = parser.parse_args()
+
+    server = PDFServer(args.pdf_pages, args.pdf_kb, 0.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = {"pdf_kb": args.pdf_kb, "papers": args.papers, "static_serving": args.static_serving, "scripts": {}}
+    try:
+        for script in args.scripts:
+            directory = tempfile.mkdtemp(prefix="live-reruns-")
+            try:
+                write_scenario(directory, args.papers, args.papers * 11, "journal", server.base_url)
+                metrics = results["scripts"][script] = measure(script, directory, args)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            print(script)
+            for metric, value in metrics.items():
+                print(f"  {metric:<24} {value:10.3f}")
+    finally:
+        server.shutdown()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""Hammer a response store with concurrent saves from several processes.
+
+Usage:
+    python -m benchmarks.stress_saves [--processes 8] [--saves 300] [--papers 10] [--store journal]
+
+Every writer process answers its own question of a shared set of papers and
+saves based on the version it last saw, so writers of the same reviewer
+conflict constantly and must be merged question by question. A reader process
+keeps loading the whole store meanwhile. Compaction runs often, so rotations
+race with appends. At the end each writer's last answer must be stored for
+every paper, no load may fail and no paper version may ever go backwards,
+also when a journal store is read without its schemas file.
+Finally several sessions of one reviewer save the same papers through one
+AutosaveWriter, whose queue coalesces their records, and every session's
+answer must be stored as well. Exits with status 1 on any violation.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from modules.autosave import AutosaveWriter
+from modules.stats import rekey_responses
+from modules.storage import JournalStore, ShardedJournalStore, SQLiteStore
+
+
+def open_store(kind, directory, compact_threshold):
+    if kind == "journal":
+        return ShardedJournalStore(
+            os.path.join(directory, "responses.json"),
+            os.path.join(directory, "responses"),
+            compact_threshold,
+        )
+    return SQLiteStore(os.path.join(directory, "responses.db"))
+
+
+def writer(args, index, directory, start):
+    """Save random papers; return {(reviewer, paper_id): last answer}, latencies and merge count."""
+    store = open_store(args.store, directory, args.compact_threshold)
+    reviewer = f"reviewer-{index % args.reviewers}"
+    q_key = f"q_{index}"
+    questions = [{"id": i, "category": "general", "type": "text"} for i in range(args.processes)]
+    rng = random.Random(index)
+    known = {}
+    last_answers = {}
+    latencies = []
+    merges = 0
+    start.wait()
+    for n in range(args.saves):
+        paper_id = str(rng.randrange(args.papers))
+        version, responses = known.get(paper_id, (0, {}))
+        answer = f"{index}-{n}"
+        record = {
+            "paper_id": paper_id,
+            "paper_title": f"Paper {paper_id}",
+            "responses": {**responses, q_key: answer},
+            "questions": questions,
+            "version": version + 1,
+        }
+        started = time.perf_counter()
+        version, merged = store.save_paper(paper_id, record, reviewer, version, {q_key})
+        latencies.append(time.perf_counter() - started)
+        if merged:
+            merges += 1
+            # Pick up the answers of the other writers, as a session would
+            stored = store.load_paper(paper_id, reviewer)
+            version, responses = stored["version"], stored["responses"]
+        else:
+            responses = record["responses"]
+        known[paper_id] = (version, responses)
+        last_answers[(reviewer, paper_id)] = answer
+    if args.store == "journal":
+        for shard_reviewer in store.reviewers():
+            thread = store.shard(shard_reviewer)._compact_thread
+            if thread is not None:
+                thread.join()
+    return last_answers, latencies, merges
+
+
+def reader(args, directory, start, stop):
+    """Load every reviewer's responses until told to stop; return (loads, errors, regressions)."""
+    store = open_store(args.store, directory, args.compact_threshold)
+    reviewers = [f"reviewer-{i}" for i in range(min(args.reviewers, args.processes))]
+    seen = {}
+    loads = errors = regressions = 0
+    start.wait()
+    while not stop.is_set():
+        for reviewer in reviewers:
+            try:
+                data = store.load_all(reviewer)
+            except Exception as e:
+                print(f"reader: load failed: {e!r}", file=sys.stderr)
+                errors += 1
+                continue
+            loads += 1
+            for paper_id, record in data.items():
+                key = (reviewer, str(paper_id))
+                if record.get("version", 0) < seen.get(key, 0):
+                    regressions += 1
+                seen[key] = max(seen.get(key, 0), record.get("version", 0))
+    return loads, errors, regressions
+
+
+def autosave_sessions(args, directory):
+    """Save every paper from several sessions through one AutosaveWriter; return the lost answers.
+
+    Each session answers its own question based on the version it loaded, and
+    sessions alternate between the "3" and "q_3" key conventions. The debounce
+    outlasts the run, so all records of a paper are coalesced in the queue.
+    A journal store is read back after deleting its schemas file.
+    """
+    os.makedirs(directory)
+    store = open_store(args.store, directory, args.compact_threshold)
+    writer = AutosaveWriter(store, debounce=60, max_delay=60)
+    sessions = args.processes
+    questions = [{"id": i, "category": "general", "type": "text"} for i in range(sessions)]
+    for paper_id in map(str, range(args.papers)):
+        for index in range(sessions):
+            prefix = "q_" if index % 2 else ""
+            responses = {f"{prefix}{i}": "" for i in range(sessions)}
+            responses[f"{prefix}{index}"] = f"session-{index}"
+            record = {"paper_id": paper_id, "responses": responses, "questions": questions, "version": 1}
+            writer.submit("reviewer-0", paper_id, record, 0, {f"{prefix}{index}"})
+    writer.close()
+    if args.store == "journal":
+        # The journal must be readable without the schemas file
+        os.remove(store.shard("reviewer-0").schemas.path)
+        store = open_store(args.store, directory, args.compact_threshold)
+    lost = 0
+    for paper_id in map(str, range(args.papers)):
+        stored = rekey_responses((store.load_paper(paper_id, "reviewer-0") or {}).get("responses", {}), "q_")
+        for index in range(sessions):
+            if stored.get(f"q_{index}") != f"session-{index}":
+                lost += 1
+                print(f"lost autosave: paper {paper_id} q_{index}: stored {stored.get(f'q_{index}')}")
+    return lost
+
+
+def _run_writer(queue, *args):
+    queue.put(("writer", writer(*args)))
+
+
+def _run_reader(queue, *args):
+    queue.put(("reader", reader(*args)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the response store with concurrent writer processes.")
+    parser.add_argument("--processes", type=int, default=8, help="Writer processes")
+    parser.add_argument("--saves", type=int, default=300, help="Saves per writer")
+    parser.add_argument("--papers", type=int, default=10, help="Papers shared by the writers")
+    parser.add_argument("--reviewers", type=int, default=1, help="Reviewers the writers are spread over")
+    parser.add_argument("--store", choices=["journal", "sqlite"], default="journal")
+    parser.add_argument("--compact-threshold", type=int, default=100, help="Journal records per compaction")
+    parser.add_argument("--keep", action="store_true", help="Keep the store directory for inspection")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="stress-saves-")
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    start = context.Event()
+    stop = context.Event()
+    writers = [
+        context.Process(target=_run_writer, args=(queue, args, i, directory, start))
+        for i in range(args.processes)
+    ]
+    reader_process = context.Process(target=_run_reader, args=(queue, args, directory, start, stop))
+    for process in writers + [reader_process]:
+        process.start()
+
+    started = time.perf_counter()
+    start.set()
+    expected = {}
+    latencies = []
+    merges = 0
+    for _ in writers:
+        _, (last_answers, writer_latencies, writer_merges) = queue.get()
+        latencies.extend(writer_latencies)
+        merges += writer_merges
+        for key, answer in last_answers.items():
+            expected.setdefault(key, []).append(answer)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    _, (loads, errors, regressions) = queue.get()
+    for process in writers + [reader_process]:
+        process.join()
+
+    store = open_store(args.store, directory, args.compact_threshold)
+    lost = 0
+    for (reviewer, paper_id), answers in expected.items():
+        stored = (store.load_paper(paper_id, reviewer) or {}).get("responses", {})
+        for answer in answers:
+            q_key = f"q_{answer.split('-')[0]}"
+            if stored.get(q_key) != answer:
+                lost += 1
+                print(f"lost update: {reviewer} paper {paper_id} {q_key}: expected {answer}, stored {stored.get(q_key)}")
+    if args.store == "journal":
+        # A final compaction must preserve everything as well
+        for reviewer in store.reviewers():
+            shard = store.shard(reviewer)
+            before = shard.load_all()
+            # The snapshot and journals must be readable without the schemas file
+            os.remove(shard.schemas.path)
+            if JournalStore(shard.path, reviewer=reviewer).load_all() != before:
+                lost += 1
+                print(f"the records of {reviewer} changed without the schemas file")
+            shard.compact()
+            if JournalStore(shard.path, reviewer=reviewer).load_all() != before:
+                lost += 1
+                print(f"compaction changed the records of {reviewer}")
+
+    autosave_lost = autosave_sessions(args, os.path.join(directory, "autosave"))
+
+    saves = len(latencies)
+    latencies.sort()
+    print(f"{args.processes} writers x {args.saves} saves on {args.papers} papers, "
+          f"{args.reviewers} reviewer(s), {args.store} store")
+    print(f"  {saves} saves in {elapsed:.2f}s ({saves / elapsed:.0f}/s), {merges} merged after a conflict")
+    print(f"  save latency p50 {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    print(f"  reader: {loads} loads, {errors} failed, {regressions} version regressions")
+    print(f"  lost updates: {lost}")
+    print(f"  lost answers of sessions coalesced by the autosave writer: {autosave_lost}")
+
+    if args.keep:
+        print(f"  store kept in {directory}")
+    else:
+        shutil.rmtree(directory)
+    return 1 if lost or autosave_lost or errors or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import pandas as pd
+
+
+def questions_frame(questions):
+    """Return compiled questions as a DataFrame indexed by question id."""
+    frame = pd.DataFrame.from_records(
+        [
+            {
+                "question_id": q["id"],
+                "category": q["category"],
+                "type": q["type"],
+                "text": q["text"],
+                "min": q.get("min"),
+                "max": q.get("max"),
+            }
+            for q in questions
+        ],
+        columns=["question_id", "category", "type", "text", "min", "max"],
+    )
+    return frame.set_index("question_id")
+
+
+def answers_frame(records, questions):
+    """Load (reviewer, paper_id, record) tuples into a columnar DataFrame of answers.
+
+    Reviewer, paper, question, category and type are categorical. Answers are
+    kept as strings, with ratings also parsed into a numeric column, and an
+    `answered` flag is computed once for every row.
+    """
+    # Columns are collected per record; reviewer and paper are repeated once
+    # per answer only as categoricals
+    reviewers, paper_ids, counts, keys, answers = [], [], [], [], []
+    for reviewer, paper_id, record in records:
+        responses = record.get("responses", {})
+        reviewers.append(reviewer)
+        paper_ids.append(str(paper_id))
+        counts.append(len(responses))
+        keys.extend(responses)
+        answers.extend(responses.values())
+
+    # Both response key conventions ("3" and "q_3"); other keys are dropped
+    digits = pd.Series(keys, dtype="string").str.removeprefix("q_")
+    is_question = digits.str.fullmatch("[0-9]+").fillna(False).to_numpy(dtype=bool)
+    question_meta = questions_frame(questions)
+
+    frame = pd.DataFrame({
+        "reviewer": pd.Categorical(reviewers).repeat(counts)[is_question],
+        "paper_id": pd.Categorical(paper_ids).repeat(counts)[is_question],
+        "question_id": digits[is_question].astype("int64").to_numpy(),
+        "answer": pd.Series(answers, dtype="object")[is_question].to_numpy(),
+    })
+    frame["category"] = frame["question_id"].map(question_meta["category"]).astype("category")
+    frame["type"] = frame["question_id"].map(question_meta["type"]).astype("category")
+    frame["answer"] = frame["answer"].astype("string").str.strip()
+    frame["answered"] = frame["answer"].fillna("").ne("")
+    is_rating = frame["type"] == "rating"
+    frame["rating"] = pd.to_numeric(frame["answer"][is_rating], errors="coerce").reindex(frame.index)
+    for column in ("reviewer", "paper_id"):
+        frame[column] = frame[column].cat.remove_unused_categories()
+    frame["question_id"] = frame["question_id"].astype("category")
+    return frame
+
+
+def rating_distribution(frame):
+    """Return counts of each rating value per rating question (rows: question, columns: value)."""
+    ratings = frame[frame["answered"] & frame["rating"].notna()]
+    if ratings.empty:
+        return pd.DataFrame()
+    return (
+        ratings.groupby(["question_id", "rating"], observed=True)
+        .size()
+        .unstack(fill_value=0)
+        .rename(columns=lambda v: int(v))
+    )
+
+
+def option_frequencies(frame):
+    """Return how often each option was chosen per multiple-choice question."""
+    choices = frame[frame["answered"] & (frame["type"] == "multiple_choice")]
+    if choices.empty:
+        return pd.DataFrame(columns=["question_id", "answer", "count", "share"])
+    counts = choices.groupby(["question_id", "answer"], observed=True).size().rename("count").reset_index()
+    totals = counts.groupby("question_id", observed=True)["count"].transform("sum")
+    counts["share"] = counts["count"] / totals
+    return counts.sort_values(["question_id", "count"], ascending=[True, False])
+
+
+def completion_funnel(frame, questions):
+    """Return, per category, how many reviewed papers started and completed it."""
+    per_category = questions_frame(questions).groupby("category").size().rename("questions")
+    answered = (
+        frame[frame["answered"]]
+        .groupby(["reviewer", "paper_id", "category"], observed=True)
+        .size()
+        .rename("answered")
+        .reset_index()
+    )
+    reviewed = frame.groupby(["reviewer", "paper_id"], observed=True).ngroups
+    answered["complete"] = answered["answered"] >= answered["category"].map(per_category).astype("int64")
+    funnel = answered.groupby("category", observed=True).agg(
+        started=("answered", "size"),
+        completed=("complete", "sum"),
+    )
+    funnel = funnel.reindex(per_category.index, fill_value=0)
+    funnel.insert(0, "reviewed", reviewed)
+    return funnel
+
+
+def reviewer_agreement(frame):
+    """Return observed pairwise agreement per closed question (multiple choice and rating).
+
+    For every paper rated by at least two reviewers, agreement is the share
+    of reviewer pairs that gave the same answer. Pairs are pooled across
+    papers for each question.
+    """
+    closed = frame[frame["answered"] & frame["type"].isin(["multiple_choice", "rating"])]
+    if closed.empty:
+        return pd.DataFrame(columns=["papers", "pairs", "agreement"])
+
+    same = closed.groupby(["paper_id", "question_id", "answer"], observed=True).size()
+    same_pairs = (same * (same - 1) // 2).groupby(level=["paper_id", "question_id"], observed=True).sum()
+    raters = closed.groupby(["paper_id", "question_id"], observed=True).size()
+    pairs = raters * (raters - 1) // 2
+
+    per_item = pd.DataFrame({"same": same_pairs, "pairs": pairs})
+    per_item = per_item[per_item["pairs"] > 0]
+    if per_item.empty:
+        return pd.DataFrame(columns=["papers", "pairs", "agreement"])
+    result = per_item.groupby(level="question_id", observed=True).agg(
+        papers=("pairs", "size"),
+        pairs=("pairs", "sum"),
+        same=("same", "sum"),
+    )
+    result["agreement"] = result["same"] / result["pairs"]
+    return result.drop(columns="same")
@@ -0,0 +1,107 @@
+import streamlit as st
+import hmac
+import time
+from modules.storage import DEFAULT_REVIEWER
+
+def check_password(title="🔒 Admin Panel Login"):
+    """Returns `True` if the admin is logged in, `False` otherwise."""
+    # If the user is already logged in, return True
+    if st.session_state.get("admin_logged_in"):
+        return True
+
+    # --- Login Form ---
+    st.title(title)
+    st.markdown("---")
+    
+    try:
+        # Get credentials from Streamlit secrets
+        admin_username = st.secrets["admin_credentials"]["username"]
+        admin_password = st.secrets["admin_credentials"]["password"]
+    except (KeyError, FileNotFoundError):
+        st.error(
+            "Admin credentials are not configured. "
+            "Please create a `.streamlit/secrets.toml` file."
+        )
+        return False
+
+    username = st.text_input("Username", key="admin_user")
+    password = st.text_input("Password", type="password", key="admin_pass")
+
+    if st.button("Login", key="admin_login_btn"):
+        if username == admin_username and password == admin_password:
+            st.session_state["admin_logged_in"] = True
+            # Rerun the script to reflect the new login state
+            st.rerun()
+        else:
+            st.error("The username or password you entered is incorrect.")
+            # Simple delay to mitigate brute-force attacks
+            time.sleep(1)
+    
+    return False
+
+def _secrets_section(name):
+    """Returns a secrets section as a dict, or an empty dict if it is not configured."""
+    try:
+        return dict(st.secrets[name])
+    except (KeyError, FileNotFoundError):
+        return {}
+
+def current_reviewer():
+    """Returns the reviewer id of this session."""
+    return st.session_state.get("reviewer", DEFAULT_REVIEWER)
+
+def _sign_in(reviewer):
+    st.session_state["reviewer"] = reviewer
+    st.rerun()
+
+def _render_sign_out(reviewer):
+    st.sidebar.caption(f"👤 Signed in as **{reviewer}**")
+    if st.sidebar.button("Sign out", key="reviewer_logout_btn"):
+        # Responses, fingerprints and widget values all belong to this reviewer
+        st.session_state.clear()
+        st.query_params.clear()
+        st.rerun()
+
+def reviewer_login():
+    """Identifies the reviewer of this session and returns their id, or `None` while signing in.
+
+    Reviewers open a token link (`?token=...`) listed under `[reviewer_tokens]`
+    in the secrets, or sign in with a username and password listed under
+    `[reviewers]`. Without either section every session reviews as the
+    default reviewer, as before reviewer accounts existed.
+    """
+    passwords = _secrets_section("reviewers")
+    tokens = _secrets_section("reviewer_tokens")
+    if not passwords and not tokens:
+        return DEFAULT_REVIEWER
+
+    if "reviewer" in st.session_state:
+        _render_sign_out(st.session_state["reviewer"])
+        return st.session_state["reviewer"]
+
+    token = st.query_params.get("token")
+    if token:
+        for known_token, reviewer in tokens.items():
+            if hmac.compare_digest(str(known_token), token):
+                _sign_in(str(reviewer))
+        st.error("This review link is not valid.")
+
+    st.title("🔒 Reviewer Login")
+    st.markdown("---")
+    if not passwords:
+        st.info("Please open the personal review link you were given.")
+        return None
+
+    username = st.text_input("Username", key="reviewer_user")
+    password = st.text_input("Password", type="password", key="reviewer_pass")
+
+    if st.button("Login", key="reviewer_login_btn"):
+        expected = passwords.get(username)
+        if expected is not None and hmac.compare_digest(str(expected), password):
+            _sign_in(username)
+        else:
+            st.error("The username or password you entered is incorrect.")
+            # Simple delay to mitigate brute-force attacks
+            time.sleep(1)
+
+    return None
@@ -0,0 +1,225 @@
+import atexit
+import os
+import threading
+import time
+
+from modules.metrics import timer
+from modules.stats import rekey_responses, response_key_prefix
+from modules.storage import merge_records
+
+# Seconds without further changes before a paper's record is written
+DEFAULT_DEBOUNCE = 2.0
+# A record that keeps changing is still written after this many seconds
+DEFAULT_MAX_DELAY = 10.0
+
+
+def coalesce(queued, queued_changed, record, changed):
+    """Fold `record` into the record still queued for the same paper; return (record, changed).
+
+    Sessions of one reviewer share the queue, so only the answers in
+    `changed` replace the queued ones. A record without changed keys
+    replaces the queued one and is written as is.
+    """
+    if changed is None:
+        return record, None
+    record = merge_records(queued, record, changed)
+    if queued_changed is None:
+        return record, None
+    prefix = response_key_prefix(record.get("responses", {}))
+    return record, set(rekey_responses(dict.fromkeys(queued_changed | changed), prefix))
+
+
+class AutosaveWriter:
+    """Background thread that writes paper records to a response store.
+
+    Records are queued per (reviewer, paper), so a burst of edits to one paper
+    collapses into a single write of its latest record. A record is written
+    once it has been quiet for `debounce` seconds, or `max_delay` seconds
+    after it was first queued, whichever comes first, which bounds how much
+    work a crash can lose. Pending records are flushed at interpreter exit.
+
+    A coalesced write takes only the changed answers of each record, keeps the
+    base version of the first queued record and the union of the changed
+    questions, so neither another session of the reviewer nor another
+    process that saved the paper in the meantime loses answers.
+    """
+
+    def __init__(self, store, debounce=None, max_delay=None):
+        if debounce is None:
+            debounce = float(os.environ.get("AUTOSAVE_DEBOUNCE_SECONDS", DEFAULT_DEBOUNCE))
+        if max_delay is None:
+            max_delay = float(os.environ.get("AUTOSAVE_MAX_DELAY_SECONDS", DEFAULT_MAX_DELAY))
+        self.store = store
+        self.debounce = debounce
+        self.max_delay = max(max_delay, debounce)
+        self._cond = threading.Condition()
+        # (reviewer, paper_id) -> [record, first queued, last queued, base version, changed keys]
+        self._pending = {}
+        # (reviewer, paper_id) -> number of writes merged with another writer's answers
+        self._merges = {}
+        self._writing = 0
+        self._flush_requested = False
+        self._closed = False
+        self.queued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+        self.merged = 0
+        self.last_error = None
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._thread = threading.Thread(target=self._run, name="responses-autosave", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- Queueing ---
+
+    def submit(self, reviewer, paper_id, record, base_version=None, changed=None):
+        """Queue the latest record of a paper, replacing any record still pending for it.
+
+        `base_version` is the stored version the record was derived from and
+        `changed` the questions edited since; without them the record is
+        written as is.
+        """
+        key = (reviewer, str(paper_id))
+        now = time.monotonic()
+        changed = None if changed is None else set(changed)
+        with self._cond:
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = [record, now, now, base_version, changed]
+            else:
+                entry[0], entry[4] = coalesce(entry[0], entry[4], record, changed)
+                entry[2] = now
+                self.coalesced += 1
+            self.queued += 1
+            self._cond.notify_all()
+
+    def pending(self, reviewer, paper_id):
+        """Return the record still waiting to be written for a paper, or None."""
+        with self._cond:
+            entry = self._pending.get((reviewer, str(paper_id)))
+            return entry[0] if entry else None
+
+    def pending_records(self, reviewer):
+        """Return {paper_id: record} of every record of `reviewer` not written yet."""
+        with self._cond:
+            return {
+                paper_id: entry[0]
+                for (entry_reviewer, paper_id), entry in self._pending.items()
+                if entry_reviewer == reviewer
+            }
+
+    def merge_count(self, reviewer, paper_id):
+        """Return how many writes of a paper were merged with answers saved elsewhere."""
+        with self._cond:
+            return self._merges.get((reviewer, str(paper_id)), 0)
+
+    # --- Writing ---
+
+    def _due(self, now):
+        """Return the keys ready to be written and the seconds until the next one is."""
+        due = []
+        wait = None
+        for key, (_, first, last, _, _) in self._pending.items():
+            ready_at = min(last + self.debounce, first + self.max_delay)
+            if self._flush_requested or ready_at <= now:
+                due.append(key)
+            else:
+                wait = ready_at - now if wait is None else min(wait, ready_at - now)
+        return due, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    due, wait = self._due(time.monotonic())
+                    if due or (self._closed and not self._pending):
+                        break
+                    self._cond.wait(wait)
+                if not due:
+                    return
+                batch = [(key, self._pending.pop(key)) for key in due]
+                self._writing += 1
+
+            failures = sum(not self._write(key, entry) for key, entry in batch)
+            if failures:
+                # Back off instead of spinning on a store that keeps failing
+                time.sleep(self.debounce)
+
+            with self._cond:
+                self._writing -= 1
+                if not self._pending:
+                    self._flush_requested = False
+                self._cond.notify_all()
+
+    def _write(self, key, entry):
+        reviewer, paper_id = key
+        record, first, _, base_version, changed = entry
+        try:
+            with timer("store_write"):
+                _, merged = self.store.save_paper(paper_id, record, reviewer, base_version, changed)
+        except Exception as e:
+            with self._cond:
+                self.failed += 1
+                self.last_error = str(e)
+                # Retry after the debounce window. A newer record queued meanwhile is
+                # folded into this one and must now be based on its base version.
+                newer = self._pending.get(key)
+                if newer is None:
+                    self._pending[key] = [record, first, time.monotonic(), base_version, changed]
+                else:
+                    newer[0], newer[4] = coalesce(record, changed, newer[0], newer[4])
+                    newer[1] = min(newer[1], first)
+                    newer[3] = base_version
+            return False
+        lag = time.monotonic() - first
+        with self._cond:
+            if merged:
+                self.merged += 1
+                self._merges[key] = self._merges.get(key, 0) + 1
+            self.written += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+        return True
+
+    def flush(self, timeout=None):
+        """Write every pending record now and wait until they are stored.
+
+        Returns True if the queue drained within `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._writing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout=30):
+        """Flush pending records and stop the writer thread."""
+        with self._cond:
+            self._closed = True
+        self.flush(timeout)
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Return queue depth, write lag and write counters."""
+        with self._cond:
+            now = time.monotonic()
+            oldest = min((entry[1] for entry in self._pending.values()), default=None)
+            return {
+                "queue_depth": len(self._pending),
+                "oldest_pending": 0.0 if oldest is None else now - oldest,
+                "queued": self.queued,
+                "coalesced": self.coalesced,
+                "written": self.written,
+                "failed": self.failed,
+                "merged": self.merged,
+                "last_error": self.last_error,
+                "last_lag": self.last_lag,
+                "max_lag": self.max_lag,
+            }
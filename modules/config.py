@@ -1,114 +1,260 @@
+import hashlib
 import json
 import os
+import threading
+from types import MappingProxyType
 import streamlit as st
+from modules.metrics import timed
 
-def load_config():
-    """Load configuration from JSON file or use defaults"""
-    config_path = "papers_config.json"
-    
-    default_config = {
-        "papers": [
+CONFIG_PATH = "papers_config.json"
+
+DEFAULT_CONFIG = {
+    "papers": [
+        {
+            "id": 1,
+            "title": "Attention Is All You Need",
+            "pdf_url": "https://arxiv.org/pdf/1706.03762.pdf",
+            "local_pdf": None
+        },
+        {
+            "id": 2,
+            "title": "Highly accurate protein structure prediction with AlphaFold",
+            "pdf_url": "https://www.ncbi.nlm.nih.gov/pmc/articles/PMC8372483/pdf/41586_2021_3819_merged_1626279313.pdf",
+            "local_pdf": None
+        },
+        {
+            "id": 3,
+            "title": "BERT: A Review of Applications in Biomedical Information Extraction",
+            "pdf_url": "https://www.ncbi.nlm.nih.gov/pmc/articles/PMC7356345/pdf/bioengineering-07-00057.pdf",
+            "local_pdf": None
+        }
+    ],
+    "question_templates": {
+        "understanding": [
             {
-                "id": 1,
-                "title": "Attention Is All You Need",
-                "pdf_url": "https://arxiv.org/pdf/1706.03762.pdf",
-                "local_pdf": None
+                "text": "What is the main research question or problem addressed in this paper?",
+                "type": "text"
             },
             {
-                "id": 2,
-                "title": "Highly accurate protein structure prediction with AlphaFold",
-                "pdf_url": "https://www.ncbi.nlm.nih.gov/pmc/articles/PMC8372483/pdf/41586_2021_3819_merged_1626279313.pdf",
-                "local_pdf": None
+                "text": "What is the primary hypothesis or thesis statement?",
+                "type": "text"
             },
             {
-                "id": 3,
-                "title": "BERT: A Review of Applications in Biomedical Information Extraction",
-                "pdf_url": "https://www.ncbi.nlm.nih.gov/pmc/articles/PMC7356345/pdf/bioengineering-07-00057.pdf",
-                "local_pdf": None
+                "text": "What are the key objectives of this research?",
+                "type": "text"
             }
         ],
-        "question_templates": {
-            "understanding": [
-                {
-                    "text": "What is the main research question or problem addressed in this paper?",
-                    "type": "text"
-                },
-                {
-                    "text": "What is the primary hypothesis or thesis statement?",
-                    "type": "text"
-                },
-                {
-                    "text": "What are the key objectives of this research?",
-                    "type": "text"
-                }
-            ],
-            "methodology": [
-                {
-                    "text": "What research methodology was employed?",
-                    "type": "multiple_choice",
-                    "options": ["Experimental", "Theoretical", "Computational", "Mixed Methods", "Other"]
-                },
-                {
-                    "text": "Describe the experimental setup or study design in detail.",
-                    "type": "text"
-                }
-            ],
-            "results": [
-                {
-                    "text": "What are the three most significant findings?",
-                    "type": "text"
-                },
-                {
-                    "text": "Were there any unexpected results?",
-                    "type": "multiple_choice",
-                    "options": ["Yes", "No", "Somewhat"]
-                }
-            ],
-            "analysis": [
-                { "text": "What are the main limitations?", "type": "text" },
-                {
-                    "text": "How robust are the conclusions?",
-                    "type": "multiple_choice",
-                    "options": ["Very Robust", "Robust", "Moderate", "Weak", "Very Weak"]
-                }
-            ],
-            "impact": [
-                { "text": "What are the practical applications?", "type": "text" },
-                {
-                    "text": "Rate the overall quality",
-                    "type": "rating",
-                    "min": 1,
-                    "max": 5
-                }
-            ]
-        }
+        "methodology": [
+            {
+                "text": "What research methodology was employed?",
+                "type": "multiple_choice",
+                "options": ["Experimental", "Theoretical", "Computational", "Mixed Methods", "Other"]
+            },
+            {
+                "text": "Describe the experimental setup or study design in detail.",
+                "type": "text"
+            }
+        ],
+        "results": [
+            {
+                "text": "What are the three most significant findings?",
+                "type": "text"
+            },
+            {
+                "text": "Were there any unexpected results?",
+                "type": "multiple_choice",
+                "options": ["Yes", "No", "Somewhat"]
+            }
+        ],
+        "analysis": [
+            { "text": "What are the main limitations?", "type": "text" },
+            {
+                "text": "How robust are the conclusions?",
+                "type": "multiple_choice",
+                "options": ["Very Robust", "Robust", "Moderate", "Weak", "Very Weak"]
+            }
+        ],
+        "impact": [
+            { "text": "What are the practical applications?", "type": "text" },
+            {
+                "text": "Rate the overall quality",
+                "type": "rating",
+                "min": 1,
+                "max": 5
+            }
+        ]
     }
-    
-    try:
-        if os.path.exists(config_path):
-            with open(config_path, 'r') as f:
-                return json.load(f)
-    except Exception as e:
-        st.warning(f"Using default configuration. Create 'papers_config.json' to customize.")
-    
-    return default_config
-
-def get_questions_for_paper(paper_id, question_templates):
-    """Compile all questions with proper IDs and metadata"""
-    questions = []
-    q_id = 0
-    
-    for category, category_questions in question_templates.items():
-        for question in category_questions:
-            questions.append({
-                "id": q_id,
-                "category": category,
-                "text": question["text"],
-                "type": question["type"],
-                "options": question.get("options", []),
-                "min": question.get("min", 1),
-                "max": question.get("max", 5)
-            })
-            q_id += 1
-    
-    return questions
\ No newline at end of file
+}
+
+class ConfigError(ValueError):
+    """Raised when papers_config.json does not match the expected schema."""
+
+QUESTION_TYPES = ("text", "multiple_choice", "rating")
+
+def validate_config(config):
+    """Check a parsed config against the expected schema and raise ConfigError on the first problem."""
+    if not isinstance(config, dict):
+        raise ConfigError("The config must be a JSON object.")
+
+    papers = config.get("papers", [])
+    if not isinstance(papers, list):
+        raise ConfigError("'papers' must be a list.")
+    seen_ids = set()
+    for i, paper in enumerate(papers):
+        if not isinstance(paper, dict):
+            raise ConfigError(f"papers[{i}] must be an object.")
+        if not isinstance(paper.get("id"), (int, str)) or isinstance(paper.get("id"), bool):
+            raise ConfigError(f"papers[{i}] needs an integer or string 'id'.")
+        if paper["id"] in seen_ids:
+            raise ConfigError(f"papers[{i}] repeats id {paper['id']!r}.")
+        seen_ids.add(paper["id"])
+        if not isinstance(paper.get("title"), str):
+            raise ConfigError(f"papers[{i}] needs a string 'title'.")
+        for field in ("pdf_url", "local_pdf"):
+            if paper.get(field) is not None and not isinstance(paper[field], str):
+                raise ConfigError(f"papers[{i}].{field} must be a string or null.")
+        for field in ("page_window", "page_prefetch"):
+            if field in paper and not isinstance(paper[field], int):
+                raise ConfigError(f"papers[{i}].{field} must be an integer.")
+
+    templates = config.get("question_templates", {})
+    if not isinstance(templates, dict):
+        raise ConfigError("'question_templates' must be an object mapping categories to question lists.")
+    for category, questions in templates.items():
+        if not isinstance(questions, list):
+            raise ConfigError(f"question_templates.{category} must be a list.")
+        for i, question in enumerate(questions):
+            where = f"question_templates.{category}[{i}]"
+            if not isinstance(question, dict) or not isinstance(question.get("text"), str):
+                raise ConfigError(f"{where} needs a string 'text'.")
+            if question.get("type") not in QUESTION_TYPES:
+                raise ConfigError(f"{where} has unknown type {question.get('type')!r}.")
+            if question["type"] == "multiple_choice" and not (
+                isinstance(question.get("options"), list) and question["options"]
+            ):
+                raise ConfigError(f"{where} needs a non-empty 'options' list.")
+            if question["type"] == "rating":
+                low, high = question.get("min", 1), question.get("max", 5)
+                if not (isinstance(low, int) and isinstance(high, int) and low < high):
+                    raise ConfigError(f"{where} needs integer 'min' < 'max'.")
+
+class LoadedConfig:
+    """A validated config together with the file state it was read from."""
+
+    __slots__ = ("config", "papers_by_id", "file_key")
+
+    def __init__(self, config, file_key):
+        self.config = config
+        self.papers_by_id = MappingProxyType({p["id"]: p for p in config.get("papers", [])})
+        self.file_key = file_key
+
+@st.cache_resource
+def _get_config_holder():
+    """Process-wide slot holding the last successfully loaded config."""
+    return {"loaded": None, "lock": threading.Lock()}
+
+def _config_file_key(config_path):
+    stat = os.stat(config_path)
+    return (os.path.abspath(config_path), stat.st_mtime_ns, stat.st_size)
+
+def get_loaded_config():
+    """Return the current LoadedConfig, re-reading papers_config.json only when it changed.
+
+    The file is parsed and validated once per change and shared by every
+    session. If a changed file fails to parse or validate, the previous good
+    config stays in use and the problem is reported.
+    """
+    if not os.path.exists(CONFIG_PATH):
+        return LoadedConfig(DEFAULT_CONFIG, None)
+
+    holder = _get_config_holder()
+    file_key = _config_file_key(CONFIG_PATH)
+    loaded = holder["loaded"]
+    if loaded is not None and loaded.file_key == file_key:
+        return loaded
+
+    with holder["lock"]:
+        loaded = holder["loaded"]
+        if loaded is not None and loaded.file_key == file_key:
+            return loaded
+        try:
+            with open(CONFIG_PATH, 'r') as f:
+                config = json.load(f)
+            validate_config(config)
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError, ConfigError) as e:
+            if loaded is not None:
+                st.warning(f"Ignoring invalid '{CONFIG_PATH}' and keeping the last valid configuration: {e}")
+                return loaded
+            st.error(f"Invalid '{CONFIG_PATH}', using the default configuration: {e}")
+            return LoadedConfig(DEFAULT_CONFIG, None)
+        holder["loaded"] = LoadedConfig(config, file_key)
+        return holder["loaded"]
+
+@timed("load_config")
+def load_config():
+    """Load configuration from JSON file or use defaults"""
+    return get_loaded_config().config
+
+def get_papers_by_id(papers):
+    """Return an id -> paper mapping; the mapping of the loaded config is reused."""
+    loaded = get_loaded_config()
+    if papers is loaded.config.get("papers"):
+        return loaded.papers_by_id
+    return {p["id"]: p for p in papers}
+
+class QuestionSchema:
+    """Immutable compiled form of `question_templates`, shared by every paper and session.
+
+    Questions are read-only mappings with their id, category and precomputed
+    response key. They are grouped per category in template order.
+    """
+
+    __slots__ = ("questions", "categories", "category_index", "questions_by_category")
+
+    def __init__(self, question_templates):
+        questions = []
+        questions_by_category = {}
+        q_id = 0
+
+        for category, category_questions in question_templates.items():
+            compiled = []
+            for question in category_questions:
+                compiled.append(MappingProxyType({
+                    "id": q_id,
+                    "category": category,
+                    "text": question["text"],
+                    "type": question["type"],
+                    "options": tuple(question.get("options", [])),
+                    "min": question.get("min", 1),
+                    "max": question.get("max", 5),
+                    "response_key": f"q_{q_id}"
+                }))
+                q_id += 1
+            questions.extend(compiled)
+            questions_by_category[category] = tuple(compiled)
+
+        self.questions = tuple(questions)
+        self.categories = tuple(questions_by_category)
+        self.category_index = MappingProxyType({c: i for i, c in enumerate(self.categories)})
+        self.questions_by_category = MappingProxyType(questions_by_category)
+
+    def __len__(self):
+        return len(self.questions)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _compile_question_schema(schema_key, _question_templates):
+    return QuestionSchema(_question_templates)
+
+def get_question_schema(question_templates):
+    """Return the compiled question schema, recompiled only when the templates change.
+
+    The templates of the loaded config are keyed on the file state they were
+    read from; any other templates are keyed on their content.
+    """
+    loaded = get_loaded_config()
+    if question_templates is loaded.config.get("question_templates"):
+        schema_key = ("config", loaded.file_key)
+    else:
+        content = json.dumps(question_templates, sort_keys=True, default=str)
+        schema_key = ("templates", hashlib.sha256(content.encode()).hexdigest())
+    return _compile_question_schema(schema_key, question_templates)
@@ -1,65 +1,291 @@
 import streamlit as st
 import json
-import os
+import threading
 from datetime import datetime
+from modules.auth import current_reviewer
+from modules.autosave import AutosaveWriter
+from modules.encoding import SchemaError
+from modules.metrics import registry, timed
+from modules.stats import question_id, rekey_responses
+from modules.storage import create_store, is_answered
+from modules.export import (
+    ANSWER_COLUMNS,
+    COMPRESSIONS,
+    EXPORT_FORMATS,
+    QUESTION_COLUMNS,
+    export_file_name,
+    export_to_tempfile,
+    iter_answer_rows,
+    iter_question_rows,
+)
 
-RESPONSES_FILE = "responses.json"
+# Seconds to wait for queued responses to be written before reporting a failure
+FLUSH_TIMEOUT = 10
 
+@st.cache_resource
+def get_response_store():
+    """Return the process-wide response store shared by all sessions and reviewers."""
+    return create_store()
+
+@st.cache_resource
+def get_autosave_writer():
+    """Return the background writer that persists responses for all sessions."""
+    return AutosaveWriter(get_response_store())
+
+class WriteStats:
+    """Process-wide counters of response saves that changed something and saves avoided."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.written = 0
+        self.skipped = 0
+
+    def record(self, written):
+        with self._lock:
+            if written:
+                self.written += 1
+            else:
+                self.skipped += 1
+
+@st.cache_resource
+def get_write_stats():
+    """Return the write counters shared by all sessions of this server process."""
+    return WriteStats()
+
+registry.register_collector("autosave", lambda: get_autosave_writer().stats())
+registry.register_collector("response_saves", lambda: {
+    "changed": get_write_stats().written,
+    "unchanged": get_write_stats().skipped,
+})
+
+def init_session_responses():
+    """Seed the session with its reviewer's responses, leaving lazily loaded stores empty."""
+    responses = {} if get_response_store().lazy else load_all_responses_from_disk()
+    # Records still queued for the background writer are newer than the store
+    responses.update(get_autosave_writer().pending_records(current_reviewer()))
+    return responses
+
+def fingerprint_responses(responses):
+    """Return a cheap hash per question used to detect changed answers.
+
+    Hashes are keyed by question id, so the same answers under the other
+    response key convention do not count as a change.
+    """
+    return {question_id(q_key): hash(repr(value)) for q_key, value in responses.items()}
+
+def question_payload(question):
+    """Return the plain, JSON-serializable form of a compiled question."""
+    payload = {k: v for k, v in question.items() if k != "response_key"}
+    payload["options"] = list(payload.get("options", []))
+    return payload
+
+@timed("save_responses")
 def save_responses(paper, responses, questions):
-    """Save responses for a single paper to session state."""
-    filtered_responses = {k: v for k, v in responses.items() if v and str(v).strip()}
-    
-    st.session_state.responses[str(paper['id'])] = {
+    """Save responses for a single paper to session state; returns the keys of changed answers."""
+    paper_id_str = str(paper['id'])
+    fingerprints = st.session_state.setdefault('response_fingerprints', {})
+    if paper_id_str not in fingerprints:
+        fingerprints[paper_id_str] = fingerprint_responses(load_responses(paper['id']))
+
+    old_fingerprint = fingerprints[paper_id_str]
+    new_fingerprint = fingerprint_responses(responses)
+    changed = [
+        q_key for q_key in responses
+        if old_fingerprint.get(question_id(q_key)) != new_fingerprint[question_id(q_key)]
+    ]
+    if not changed:
+        return changed
+
+    filtered_responses = {k: v for k, v in responses.items() if is_answered(v)}
+    versions = st.session_state.setdefault('response_versions', {})
+    if paper_id_str not in versions:
+        versions[paper_id_str] = st.session_state.responses.get(paper_id_str, {}).get("version", 0)
+
+    st.session_state.responses[paper_id_str] = {
         "paper_id": paper['id'],
         "paper_title": paper['title'],
         "responses": responses,
-        "questions": questions,
+        "questions": [question_payload(q) for q in questions],
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "completed": len(filtered_responses) == len(questions)
+        "completed": len(filtered_responses) == len(questions),
+        "version": versions[paper_id_str] + 1
     }
+    fingerprints[paper_id_str] = new_fingerprint
+    st.session_state.setdefault('changed_questions', {}).setdefault(paper_id_str, set()).update(changed)
+    st.session_state.setdefault('dirty_papers', set()).add(paper_id_str)
+    st.session_state.setdefault('answered_counts', {})[paper_id_str] = len(filtered_responses)
+    return changed
+
+def forget_paper(paper_id):
+    """Drop a paper's record, change tracking and widget values from the session."""
+    paper_id_str = str(paper_id)
+    st.session_state.responses.pop(paper_id_str, None)
+    for name in ('response_fingerprints', 'response_versions', 'changed_questions', 'answered_counts'):
+        st.session_state.get(name, {}).pop(paper_id_str, None)
+    st.session_state.get('dirty_papers', set()).discard(paper_id_str)
+    widget_prefix = f"paper_{paper_id}_"
+    for key in [k for k in st.session_state if str(k).startswith(widget_prefix)]:
+        del st.session_state[key]
+
+def refresh_merged_paper(paper_id):
+    """Reload a paper once a write of this reviewer was merged with answers saved elsewhere.
 
-def load_responses(paper_id):
-    """Load saved responses for a paper from session state."""
+    The session otherwise keeps showing, and basing new versions on, a
+    record that no longer matches the stored one.
+    """
     paper_id_str = str(paper_id)
-    if paper_id_str in st.session_state.responses:
-        return st.session_state.responses[paper_id_str].get('responses', {})
-    return {}
+    reviewer = current_reviewer()
+    writer = get_autosave_writer()
+    merges = writer.merge_count(reviewer, paper_id)
+    seen_merges = st.session_state.setdefault('seen_merges', {})
+    if seen_merges.setdefault(paper_id_str, merges) == merges or writer.pending(reviewer, paper_id) is not None:
+        return
+    seen_merges[paper_id_str] = merges
+    forget_paper(paper_id)
+    record = get_response_store().load_paper(paper_id, reviewer)
+    if record is not None:
+        st.session_state.responses[paper_id_str] = record
 
-def save_all_responses_to_disk(responses_data):
-    """Save the entire responses dictionary to a JSON file."""
+def load_responses(paper_id, key_prefix=""):
+    """Load saved responses for a paper, fetching it from a lazy store on first use.
+
+    Answers are keyed by the caller's convention, "3" or "q_3" as chosen by
+    `key_prefix`, whichever convention they were saved under.
+    """
+    paper_id_str = str(paper_id)
+    refresh_merged_paper(paper_id)
+    if paper_id_str not in st.session_state.responses:
+        store = get_response_store()
+        record = get_autosave_writer().pending(current_reviewer(), paper_id)
+        if record is None and store.lazy:
+            record = store.load_paper(paper_id, current_reviewer())
+        if record is None:
+            return {}
+        st.session_state.responses[paper_id_str] = record
+    return rekey_responses(st.session_state.responses[paper_id_str].get('responses', {}), key_prefix)
+
+def get_completion_stats():
+    """Return the store's completion statistics across all reviewers."""
+    return get_response_store().stats
+
+def get_reviewer_stats():
+    """Return the store's completion statistics covering this session's reviewer."""
+    return get_response_store().stats_for(current_reviewer())
+
+def get_answered_count(paper_id, stats=None):
+    """Count answered questions for a paper without loading it into the session.
+
+    Counts set by this session's save_responses take precedence over the
+    store's statistics, which only change once the answers are persisted.
+    Callers counting many papers pass `stats` from get_reviewer_stats(), so
+    the store checks for changes once rather than per paper.
+    """
+    answered_counts = st.session_state.setdefault('answered_counts', {})
+    paper_id_str = str(paper_id)
+    if paper_id_str in answered_counts:
+        return answered_counts[paper_id_str]
+    if stats is None:
+        stats = get_reviewer_stats()
+    return stats.paper_count(current_reviewer(), paper_id)
+
+@timed("queue_save")
+def save_paper_responses_to_disk(paper_id):
+    """Queue the session's responses for a single paper for the background writer if they changed.
+
+    The write happens off the script thread once the paper's answers stop
+    changing; call flush_responses() to wait for it.
+    """
+    paper_id_str = str(paper_id)
+    dirty_papers = st.session_state.setdefault('dirty_papers', set())
+    if paper_id_str not in dirty_papers:
+        get_write_stats().record(written=False)
+        return
     try:
-        with open(RESPONSES_FILE, 'w') as f:
-            json.dump(responses_data, f, indent=2)
+        record = st.session_state.responses[paper_id_str]
+        versions = st.session_state.setdefault('response_versions', {})
+        changed = st.session_state.setdefault('changed_questions', {}).pop(paper_id_str, set())
+        get_autosave_writer().submit(
+            current_reviewer(), paper_id, record, base_version=versions.get(paper_id_str, 0), changed=changed
+        )
+        versions[paper_id_str] = record["version"]
+        dirty_papers.discard(paper_id_str)
+        get_write_stats().record(written=True)
     except Exception as e:
         st.error(f"Failed to save responses to file: {e}")
 
+def flush_failure(writer):
+    """Return why the queued responses of `writer` were not written in time."""
+    return writer.stats()['last_error'] or 'the write is taking too long'
+
+@timed("flush_responses")
+def flush_responses(timeout=FLUSH_TIMEOUT):
+    """Write every queued response now. Returns True once they are all stored."""
+    writer = get_autosave_writer()
+    if writer.flush(timeout):
+        return True
+    st.error(f"Failed to save responses to file: {flush_failure(writer)}")
+    return False
+
 def load_all_responses_from_disk():
-    """Load all responses from the JSON file."""
-    if not os.path.exists(RESPONSES_FILE):
-        return {}
+    """Load all responses of this session's reviewer, replaying the journal on top of the snapshot."""
     try:
-        with open(RESPONSES_FILE, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
+        return get_response_store().load_all(current_reviewer())
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        # Writes are atomic, so this is a damaged file rather than a write in progress
+        st.error(f"Failed to read saved responses: {e}")
         return {}
+    except SchemaError as e:
+        # Saving on top of responses that cannot be read would hide them
+        st.error(f"Failed to read saved responses: {e}. Restore the schemas file from a backup.")
+        st.stop()
 
-def export_responses(all_responses):
-    """Create a download button for all responses in JSON format."""
-    if not all_responses:
-        st.warning("No responses to export")
-        return
-    
-    export_data = {
-        "export_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "total_papers": len(all_responses),
-        "responses": all_responses
-    }
-    
-    json_data = json.dumps(export_data, indent=2)
-    
-    st.download_button(
-        label="Download All Responses as JSON",
-        data=json_data,
-        file_name=f"research_responses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-        mime="application/json"
-    )
\ No newline at end of file
+def export_responses(questions):
+    """Render export options and a download button that streams all responses to a file.
+
+    Answers are exported one row per reviewer, paper and question; the
+    question texts go to a separate table. Files are only generated when a
+    download button is clicked.
+    """
+    store = get_response_store()
+    format_col, compression_col, level_col = st.columns(3)
+    with format_col:
+        fmt = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format")
+    with compression_col:
+        compression = st.selectbox("Compression", list(COMPRESSIONS), key="export_compression")
+    with level_col:
+        levels = COMPRESSIONS[compression]["levels"]
+        level = st.slider("Level", *levels, value=levels[0], key="export_level") if levels else None
+
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    mime = EXPORT_FORMATS[fmt]["mime"]
+
+    def answers_file():
+        # Include answers still queued for the background writer. Streamlit
+        # commands are ignored here: the browser reports a failed download and
+        # the reason is logged.
+        writer = get_autosave_writer()
+        if not writer.flush(FLUSH_TIMEOUT):
+            raise RuntimeError(f"Queued answers could not be saved: {flush_failure(writer)}")
+        return export_to_tempfile(iter_answer_rows(store.iter_records()), fmt, ANSWER_COLUMNS, compression, level)
+
+    answers_col, questions_col = st.columns(2)
+    with answers_col:
+        st.download_button(
+            label="Download Answers",
+            data=answers_file,
+            file_name=export_file_name(f"research_answers_{stamp}", fmt, compression),
+            mime=mime,
+            use_container_width=True
+        )
+    with questions_col:
+        st.download_button(
+            label="Download Questions",
+            data=lambda: export_to_tempfile(
+                iter_question_rows(questions), fmt, QUESTION_COLUMNS, compression, level
+            ),
+            file_name=export_file_name(f"research_questions_{stamp}", fmt, compression),
+            mime=mime,
+            use_container_width=True
+        )
@@ -0,0 +1,246 @@
+"""Compact, versioned on-disk encoding of paper records.
+
+A paper record as the app builds it repeats the whole question list (texts,
+options, bounds) and keys its answers by "3" (app.py) or "q_3"
+(st_research.py). A compact record instead references its question list by
+digest, keys answers by integer question id and stores multiple-choice
+answers as option indexes and ratings as ints:
+
+    {"f": 2, "s": "<schema digest>", "k": "q_", "p": 7, "t": "Title",
+     "ts": "2024-01-01 00:00:00", "c": true, "v": 3,
+     "a": [[0, "free text"], [3, 2], [10, 4], ["note", "kept as is", 0]]}
+
+"k" is the key prefix of the record's convention. Answers that do not fit
+their question (an unknown key, a value outside the options) are kept
+verbatim with a trailing 0, so decoding always returns the record that was
+encoded. Question lists are kept once per digest in a SchemaTable; a
+record whose list is unknown raises SchemaError.
+decode_record() passes records in the previous plain layout, with either
+key convention, through unchanged.
+
+Records are serialized with orjson when it is installed, else with json.
+"""
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+FORMAT_VERSION = 2
+# Marks an answer stored verbatim
+RAW = 0
+# Record fields stored under short keys
+RECORD_FIELDS = {"paper_id": "p", "paper_title": "t", "timestamp": "ts", "completed": "c", "version": "v"}
+
+
+if ORJSON_AVAILABLE:
+    def dumps(obj):
+        """Serialize `obj` to compact JSON bytes."""
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        """Serialize `obj` to compact JSON bytes."""
+        return json.dumps(obj, separators=(',', ':')).encode("utf-8")
+
+    loads = json.loads
+
+
+class SchemaError(LookupError):
+    """A compact record references a question list that is not available."""
+
+
+_digest_lock = threading.Lock()
+_last_digest = (None, None)
+# digest -> {question id: (type, options)}
+_lookups = {}
+
+
+def schema_digest(questions):
+    """Return a short content hash of a question list."""
+    global _last_digest
+    with _digest_lock:
+        # Consecutive records almost always carry the same question list;
+        # comparing it is much cheaper than hashing it again
+        if _last_digest[0] is questions or _last_digest[0] == questions:
+            return _last_digest[1]
+    canonical = json.dumps(questions, sort_keys=True, separators=(',', ':')).encode("utf-8")
+    digest = hashlib.sha256(canonical).hexdigest()[:16]
+    with _digest_lock:
+        _last_digest = (questions, digest)
+    return digest
+
+
+def _question_lookup(digest, questions):
+    lookup = _lookups.get(digest)
+    if lookup is None:
+        lookup = _lookups[digest] = {
+            q["id"]: (q.get("type"), list(q.get("options") or ()))
+            for q in questions
+            if isinstance(q, dict) and isinstance(q.get("id"), int)
+        }
+    return lookup
+
+
+def _encode_answer(key, value, prefix, lookup):
+    key = str(key)
+    digits = key[len(prefix):] if key.startswith(prefix) else ""
+    if not (digits.isascii() and digits.isdigit() and str(int(digits)) == digits):
+        return [key, value, RAW]
+    q_id = int(digits)
+    q_type, options = lookup.get(q_id, (None, None))
+    if q_type == "multiple_choice" and isinstance(value, str) and value in options:
+        return [q_id, options.index(value)]
+    if q_type == "rating" and type(value) is int:
+        return [q_id, value]
+    if q_type == "text" and isinstance(value, str):
+        return [q_id, value]
+    return [q_id, value, RAW]
+
+
+def encode_record(record, schemas):
+    """Return the compact form of a paper record, adding its question list to `schemas`."""
+    compact = {"f": FORMAT_VERSION}
+    lookup = {}
+    if "questions" in record:
+        questions = record["questions"]
+        digest = schema_digest(questions)
+        schemas.add(digest, questions)
+        compact["s"] = digest
+        lookup = _question_lookup(digest, questions)
+    for field, short in RECORD_FIELDS.items():
+        if field in record:
+            compact[short] = record[field]
+    extra = {k: v for k, v in record.items() if k not in RECORD_FIELDS and k not in ("questions", "responses")}
+    if extra:
+        compact["x"] = extra
+    if "responses" in record:
+        responses = record["responses"]
+        prefix = "q_" if any(str(key).startswith("q_") for key in responses) else ""
+        compact["k"] = prefix
+        compact["a"] = [_encode_answer(key, value, prefix, lookup) for key, value in responses.items()]
+    return compact
+
+
+def decode_record(data, schemas):
+    """Return the paper record encoded in `data`; plain records are returned as is."""
+    if "f" not in data:
+        return data
+    if data["f"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported response record format {data['f']!r}")
+    record = {}
+    for field, short in RECORD_FIELDS.items():
+        if short in data:
+            record[field] = data[short]
+    record.update(data.get("x", {}))
+    lookup = {}
+    if "s" in data:
+        questions = schemas.get(data["s"])
+        record["questions"] = questions
+        lookup = _question_lookup(data["s"], questions)
+    if "a" in data:
+        prefix = data.get("k", "")
+        responses = record["responses"] = {}
+        for answer in data["a"]:
+            key, value = answer[0], answer[1]
+            if type(key) is int:
+                if len(answer) == 2:
+                    q_type, options = lookup[key]
+                    if q_type == "multiple_choice":
+                        value = options[value]
+                key = f"{prefix}{key}"
+            responses[key] = value
+    return record
+
+
+def encode_snapshot(records, schemas):
+    """Serialize {paper_id: record} with the question lists its records reference."""
+    papers = {str(paper_id): encode_record(record, schemas) for paper_id, record in records.items()}
+    digests = {record["s"] for record in papers.values() if "s" in record}
+    return dumps({
+        "format": FORMAT_VERSION,
+        "schemas": {digest: schemas.get(digest) for digest in digests},
+        "papers": papers,
+    })
+
+
+def decode_snapshot(data, schemas):
+    """Return {paper_id: record} from a snapshot in either the compact or the plain layout."""
+    snapshot = loads(data)
+    if snapshot.get("format") != FORMAT_VERSION or "papers" not in snapshot:
+        # Snapshot written before the compact encoding
+        return snapshot
+    for digest, questions in snapshot.get("schemas", {}).items():
+        schemas.register(digest, questions)
+    return {paper_id: decode_record(record, schemas) for paper_id, record in snapshot["papers"].items()}
+
+
+class SchemaTable:
+    """Question lists referenced by compact records, by digest.
+
+    Lists are appended once to a JSON lines file next to the store, so
+    journal records written by any process can be decoded. Snapshots and
+    journals carry the lists they use as well, registered with `register()`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._schemas = {}
+        # Digests known to be in the file
+        self._written = set()
+        self._offset = 0
+
+    def _refresh(self):
+        """Read lists appended since the last read; called with the lock held."""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return
+        complete = chunk.rfind(b"\n") + 1
+        for line in chunk[:complete].splitlines():
+            try:
+                entry = loads(line)
+            except ValueError:
+                continue
+            self._schemas.setdefault(entry["s"], entry["q"])
+            self._written.add(entry["s"])
+        self._offset += complete
+
+    def get(self, digest):
+        """Return the question list of `digest`; raises SchemaError if it is unknown."""
+        with self._lock:
+            if digest not in self._schemas:
+                self._refresh()
+            if digest not in self._schemas:
+                raise SchemaError(f"Question list {digest} is neither in '{self.path}' nor stored with the records")
+            return self._schemas[digest]
+
+    def register(self, digest, questions):
+        """Remember a question list read from a snapshot without writing it."""
+        with self._lock:
+            self._schemas.setdefault(digest, questions)
+
+    def add(self, digest, questions):
+        """Make sure the question list of `digest` is on disk."""
+        with self._lock:
+            if digest in self._written:
+                return
+            self._refresh()
+            if digest in self._written:
+                return
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, dumps({"s": digest, "q": questions}) + b"\n")
+            finally:
+                os.close(fd)
+            self._schemas.setdefault(digest, questions)
+            self._written.add(digest)
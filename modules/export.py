@@ -0,0 +1,153 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from modules.stats import question_id
+
+ANSWER_COLUMNS = ["reviewer", "paper_id", "paper_title", "question_id", "answer", "timestamp"]
+QUESTION_COLUMNS = ["question_id", "category", "text", "type", "options", "min", "max"]
+
+EXPORT_FORMATS = {
+    "jsonl": {"extension": "jsonl", "mime": "application/x-ndjson"},
+    "csv": {"extension": "csv", "mime": "text/csv"},
+}
+if PYARROW_AVAILABLE:
+    EXPORT_FORMATS["parquet"] = {"extension": "parquet", "mime": "application/vnd.apache.parquet"}
+COMPRESSIONS = {
+    "none": {"suffix": "", "levels": None},
+    "gzip": {"suffix": ".gz", "levels": (1, 9)},
+}
+if ZSTD_AVAILABLE:
+    COMPRESSIONS["zstd"] = {"suffix": ".zst", "levels": (1, 19)}
+
+# Rows buffered per Parquet row group
+PARQUET_BATCH_ROWS = 50_000
+
+
+def normalize_question_id(response_key):
+    """Map both response key conventions ("3" and "q_3") to the integer question id."""
+    q_id = question_id(response_key)
+    return q_id if isinstance(q_id, int) else None
+
+
+def iter_answer_rows(records):
+    """Yield one row per (reviewer, paper, question) from (reviewer, paper_id, record) tuples."""
+    for reviewer, paper_id, record in records:
+        for response_key, answer in record.get("responses", {}).items():
+            yield {
+                "reviewer": reviewer,
+                "paper_id": str(paper_id),
+                "paper_title": record.get("paper_title"),
+                "question_id": normalize_question_id(response_key),
+                "answer": answer,
+                "timestamp": record.get("timestamp"),
+            }
+
+
+def iter_question_rows(questions):
+    """Yield one row per compiled question."""
+    for question in questions:
+        yield {
+            "question_id": question["id"],
+            "category": question["category"],
+            "text": question["text"],
+            "type": question["type"],
+            "options": list(question.get("options", [])),
+            "min": question.get("min"),
+            "max": question.get("max"),
+        }
+
+
+def _text_rows(rows, fmt, columns):
+    """Yield the encoded lines of a JSONL or CSV export."""
+    if fmt == "jsonl":
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({k: json.dumps(v) if isinstance(v, list) else v for k, v in row.items()})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _compressed_writer(fileobj, compression, level):
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=level or 6)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=level or 3).stream_writer(fileobj, closefd=False)
+    return None
+
+
+def _parquet_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value) if isinstance(value, list) else str(value)
+
+
+def _write_parquet(rows, fileobj, columns, compression, level):
+    types = {"question_id": pa.int64(), "min": pa.int64(), "max": pa.int64()}
+    schema = pa.schema([(c, types.get(c, pa.string())) for c in columns])
+    codec = "none" if compression == "none" else compression
+    with pq.ParquetWriter(fileobj, schema, compression=codec, compression_level=level) as writer:
+        batch = []
+        for row in rows:
+            batch.append({c: row[c] if c in types else _parquet_value(row[c]) for c in columns})
+            if len(batch) == PARQUET_BATCH_ROWS:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+
+def write_export(rows, fmt, columns, fileobj, compression="none", level=None):
+    """Stream `rows` into `fileobj` in the given format and compression.
+
+    Rows are encoded one at a time, or one row group at a time for
+    Parquet, so memory use does not grow with the size of the export.
+    Parquet applies compression to its own column chunks.
+    """
+    if fmt == "parquet":
+        _write_parquet(rows, fileobj, columns, compression, level)
+        return
+
+    compressor = _compressed_writer(fileobj, compression, level)
+    target = compressor or fileobj
+    for chunk in _text_rows(rows, fmt, columns):
+        target.write(chunk.encode("utf-8"))
+    if compressor is not None:
+        compressor.close()
+
+
+def export_to_tempfile(rows, fmt, columns, compression="none", level=None):
+    """Write an export to an anonymous temporary file and return it rewound."""
+    tmp = tempfile.TemporaryFile()
+    write_export(rows, fmt, columns, tmp, compression, level)
+    tmp.seek(0)
+    return tmp
+
+
+def export_file_name(stem, fmt, compression):
+    """Return the download file name of an export."""
+    suffix = "" if fmt == "parquet" else COMPRESSIONS[compression]["suffix"]
+    return f"{stem}.{EXPORT_FORMATS[fmt]['extension']}{suffix}"
@@ -0,0 +1,308 @@
+"""Rerun latency instrumentation.
+
+Stages are timed with the `timed` decorator or the `timer` context manager and
+kept in process-wide histograms, together with the bytes each rerun sends to
+the browser and the counters of registered collectors (PDF caches, autosave).
+Everything is exported as Prometheus text to METRICS_FILE, which Streamlit's
+static file route serves at app/static/metrics.txt.
+
+Set APP_METRICS=0 to turn instrumentation off: `timed` and `fragment_reruns`
+then return functions unchanged and `timer`, `begin_rerun` and `end_rerun`
+do nothing.
+"""
+import bisect
+import cProfile
+import functools
+import io
+import marshal
+import os
+import pstats
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from modules.static_pdfs import STATIC_DIR
+
+METRICS_ENABLED = os.environ.get("APP_METRICS", "1") != "0"
+METRICS_FILE = os.environ.get("APP_METRICS_FILE", os.path.join(STATIC_DIR, "metrics.txt"))
+# The metrics file is rewritten at most this often, in seconds
+METRICS_FILE_INTERVAL = 15
+# Upper bounds of the Prometheus histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+# Recent samples per histogram used for percentiles
+RESERVOIR_SIZE = 2048
+# Captured rerun profiles kept in memory
+MAX_PROFILES = 5
+
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus plus recent samples for percentiles."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def percentiles(self, *quantiles):
+        samples = sorted(self.recent)
+        if not samples:
+            return [None] * len(quantiles)
+        return [samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles]
+
+
+class MetricsRegistry:
+    """Process-wide histograms, collectors and captured profiles."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.collectors = {}
+        self.profiles = deque(maxlen=MAX_PROFILES)
+        self.profile_requested = False
+        self.started = time.time()
+        self._file_written = 0.0
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def register_collector(self, name, collect):
+        """Register a callable returning {counter: number} to export with every snapshot."""
+        self.collectors[name] = collect
+
+    def summary(self):
+        """Return {histogram: {count, mean, p50, p95, p99}}."""
+        with self._lock:
+            result = {}
+            for name, histogram in self.histograms.items():
+                p50, p95, p99 = histogram.percentiles(0.5, 0.95, 0.99)
+                result[name] = {
+                    "count": histogram.count,
+                    "mean": histogram.total / histogram.count,
+                    "p50": p50,
+                    "p95": p95,
+                    "p99": p99,
+                }
+            return result
+
+    def collect(self):
+        """Return {collector: {counter: number}}, skipping collectors that fail."""
+        values = {}
+        for name, collect in list(self.collectors.items()):
+            try:
+                values[name] = {
+                    key: value for key, value in collect().items()
+                    if isinstance(value, (int, float)) and not isinstance(value, bool)
+                }
+            except Exception:
+                continue
+        return values
+
+    def to_prometheus(self):
+        """Render every histogram and collector in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                metric = f"app_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {histogram.total:.6f}")
+                lines.append(f"{metric}_count {histogram.count}")
+        for collector, values in sorted(self.collect().items()):
+            for key, value in sorted(values.items()):
+                lines.append(f"app_{collector}_{key} {value}")
+        lines.append(f"app_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path=METRICS_FILE, force=False):
+        """Atomically rewrite the metrics file, at most every METRICS_FILE_INTERVAL seconds."""
+        now = time.monotonic()
+        if not force and now - self._file_written < METRICS_FILE_INTERVAL:
+            return
+        self._file_written = now
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".metrics-", dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+registry = MetricsRegistry()
+
+
+def timed(stage):
+    """Decorator recording the duration of every call under `stage`."""
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(stage, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+class _StageTimer:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(stage):
+    """Context manager recording the duration of its block under `stage`."""
+    return _StageTimer(stage) if METRICS_ENABLED else _NULL_TIMER
+
+
+# --- Reruns ---
+
+def _count_sent_bytes(ctx):
+    """Wrap the session's message queue once so every message sent is counted."""
+    counter = getattr(ctx, "_metrics_sent_bytes", None)
+    if counter is None:
+        counter = ctx._metrics_sent_bytes = [0]
+        enqueue = ctx._enqueue
+
+        def counting_enqueue(msg):
+            counter[0] += msg.ByteSize()
+            enqueue(msg)
+        ctx._enqueue = counting_enqueue
+    return counter
+
+
+def begin_rerun():
+    """Start timing this rerun of the app script; end_rerun() records it.
+
+    If a profile was requested from the admin page, this rerun is profiled.
+    """
+    if not METRICS_ENABLED:
+        return
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    _count_sent_bytes(ctx)[0] = 0
+    ctx._metrics_started = time.perf_counter()
+    previous = getattr(ctx, "_metrics_profiler", None)
+    if previous is not None:
+        # The profiled rerun was interrupted by st.stop() or st.rerun()
+        previous.disable()
+    ctx._metrics_profiler = None
+    if registry.profile_requested:
+        registry.profile_requested = False
+        profiler = ctx._metrics_profiler = cProfile.Profile()
+        profiler.enable()
+
+
+def end_rerun():
+    """Record the duration and bytes sent of this rerun, and any profile taken."""
+    if not METRICS_ENABLED:
+        return
+    ctx = get_script_run_ctx()
+    started = getattr(ctx, "_metrics_started", None)
+    if started is None:
+        return
+    ctx._metrics_started = None
+    duration = time.perf_counter() - started
+    registry.observe("rerun", duration)
+    registry.observe("rerun_sent_bytes", ctx._metrics_sent_bytes[0], BYTES_BUCKETS)
+
+    profiler = getattr(ctx, "_metrics_profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        ctx._metrics_profiler = None
+        _store_profile(profiler, duration, ctx.main_script_path)
+
+    try:
+        registry.write_file()
+    except OSError:
+        pass
+
+
+def fragment_reruns(func):
+    """Decorator for st.fragment bodies recording their own reruns like app reruns.
+
+    A widget inside a fragment reruns only the fragment, so begin_rerun() and
+    end_rerun() at the top and bottom of the script are skipped. Apply it
+    below @st.fragment; during full app runs it does nothing.
+    """
+    if not METRICS_ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        ctx = get_script_run_ctx()
+        if ctx is None or not ctx.fragment_ids_this_run:
+            return func(*args, **kwargs)
+        begin_rerun()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            end_rerun()
+    return wrapper
+
+
+def _store_profile(profiler, duration, script):
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(40)
+    profiler.create_stats()
+    registry.profiles.appendleft({
+        "captured_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "script": os.path.basename(script),
+        "duration": duration,
+        "report": report.getvalue(),
+        # Same format as cProfile's dump_stats, loadable with pstats or snakeviz
+        "pstats": marshal.dumps(profiler.stats),
+    })
+
+
+def request_profile():
+    """Profile the next rerun of the app in any session."""
+    registry.profile_requested = True
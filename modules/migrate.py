@@ -0,0 +1,94 @@
+"""Migrate stored responses between stores and encodings.
+
+Usage:
+    python -m modules.migrate [--source responses.json] [--shards responses] [--target responses.db]
+    python -m modules.migrate --compact [--source responses.json] [--shards responses]
+
+The first form imports the JSON response shards into the SQLite store. The
+second rewrites the JSON shards in place in the compact record encoding.
+"""
+import argparse
+import os
+
+from modules.storage import (
+    COMPACTING_SUFFIX,
+    DEFAULT_REVIEWER,
+    JOURNAL_SUFFIX,
+    RESPONSES_DB,
+    RESPONSES_DIR,
+    RESPONSES_FILE,
+    JournalStore,
+    ShardedJournalStore,
+    SQLiteStore,
+)
+
+
+def migrate_json_to_sqlite(source=RESPONSES_FILE, target=RESPONSES_DB, reviewer=DEFAULT_REVIEWER, shards=RESPONSES_DIR):
+    """Copy every paper record of every reviewer shard into the SQLite store.
+
+    Records of the default shard (`source`) are filed under `reviewer`.
+    Returns the number of records copied.
+    """
+    journal = ShardedJournalStore(source, shards)
+    database = SQLiteStore(target)
+    count = 0
+    for shard_reviewer in journal.reviewers():
+        responses = journal.load_all(shard_reviewer)
+        database.save_many(responses, reviewer if shard_reviewer == DEFAULT_REVIEWER else shard_reviewer)
+        count += len(responses)
+    return count
+
+
+def _stored_bytes(path):
+    paths = (path, path + JOURNAL_SUFFIX, path + JOURNAL_SUFFIX + COMPACTING_SUFFIX)
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+def convert_to_compact(source=RESPONSES_FILE, shards=RESPONSES_DIR):
+    """Rewrite every reviewer shard in the compact encoding.
+
+    Each shard's journal is folded into a compact snapshot, which is then
+    read back and compared with the records loaded before the rewrite.
+    Returns (records, bytes before, bytes after, reviewers whose records changed).
+    """
+    journal = ShardedJournalStore(source, shards)
+    count = before_bytes = after_bytes = 0
+    changed = []
+    for reviewer in journal.reviewers():
+        shard = journal.shard(reviewer)
+        before = shard.load_all()
+        before_bytes += _stored_bytes(shard.path)
+        shard.compact(rewrite=True)
+        after_bytes += _stored_bytes(shard.path)
+        if JournalStore(shard.path, reviewer=reviewer).load_all() != before:
+            changed.append(reviewer)
+        count += len(before)
+    return count, before_bytes, after_bytes, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate stored responses between stores and encodings.")
+    parser.add_argument("--source", default=RESPONSES_FILE, help="JSON snapshot of the default reviewer")
+    parser.add_argument("--shards", default=RESPONSES_DIR, help="Directory holding the other reviewers' shards")
+    parser.add_argument("--target", default=RESPONSES_DB, help="SQLite database to write")
+    parser.add_argument("--reviewer", default=DEFAULT_REVIEWER, help="Reviewer to file the default shard under")
+    parser.add_argument("--compact", action="store_true",
+                        help="Rewrite the JSON shards in the compact encoding instead of importing them into SQLite")
+    args = parser.parse_args()
+
+    if args.compact:
+        count, before, after, changed = convert_to_compact(args.source, args.shards)
+        print(f"Rewrote {count} paper record(s): {before / 1024 ** 2:.1f} MB -> {after / 1024 ** 2:.1f} MB")
+        if changed:
+            # Only possible if the app saved answers during the rewrite
+            print(f"Records changed while converting the shards of: {', '.join(changed)}")
+            return 1
+        return 0
+
+    count = migrate_json_to_sqlite(args.source, args.target, args.reviewer, args.shards)
+    print(f"Imported {count} paper record(s) from {args.source} and {args.shards} into {args.target}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,467 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from modules.storage import atomic_write_json
+
+PDF_CACHE_DIR = "pdf_cache"
+UPLOAD_DIR = "pdf_uploads"
+INDEX_FILE = "index.json"
+CONFIG_FILE = "papers_config.json"
+
+# Byte budget for cached PDFs; override with the PDF_CACHE_MAX_BYTES env var
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Memory ceiling for PDF bytes held in process; override with PDF_MEMORY_CACHE_MAX_BYTES
+DEFAULT_MEMORY_MAX_BYTES = 512 * 1024 ** 2
+# Serve cached copies without contacting the origin for this many seconds
+REVALIDATE_AFTER = 24 * 60 * 60
+# Largest PDF accepted from reviewers; override with the PDF_UPLOAD_MAX_BYTES env var
+DEFAULT_UPLOAD_MAX_BYTES = 100 * 1024 ** 2
+CHUNK_SIZE = 64 * 1024
+
+
+_digest_lock = threading.Lock()
+_digests = {}
+
+
+def file_digest(path):
+    """Return the SHA-256 of a file, memoized on (path, mtime, size)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _digest_lock:
+        if key in _digests:
+            return _digests[key]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    with _digest_lock:
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+class SharedIndex:
+    """JSON index file shared by the processes using one directory.
+
+    Subclasses set `index_path`, `_index` and `_index_mtime`, and call these
+    methods with their lock held.
+    """
+
+    def _refresh_index(self):
+        """Reload the index if another process has rewritten it."""
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except FileNotFoundError:
+            return
+        if mtime != self._index_mtime:
+            try:
+                with open(self.index_path, 'r') as f:
+                    self._index = json.load(f)
+            except json.JSONDecodeError:
+                self._index = {}
+            self._index_mtime = mtime
+
+    def _save_index(self):
+        atomic_write_json(self.index_path, self._index, indent=2)
+        self._index_mtime = os.path.getmtime(self.index_path)
+
+
+class PDFCache(SharedIndex):
+    """Disk-backed PDF cache keyed by URL and stored by content hash.
+
+    The index maps each URL to the SHA-256 of its content together with the
+    ETag and Last-Modified headers used for conditional revalidation. The
+    modification time of each object file records its last use, and the
+    least recently used objects are evicted once the byte budget is exceeded.
+    """
+
+    def __init__(self, cache_dir=PDF_CACHE_DIR, max_bytes=None, revalidate_after=REVALIDATE_AFTER):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("PDF_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self._lock = threading.Lock()
+        self._index = {}
+        self._index_mtime = None
+        self._counters = {"fresh": 0, "revalidated": 0, "downloaded": 0, "offline": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # --- Index ---
+
+    def object_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.pdf")
+
+    def entry(self, url):
+        """Return the index entry for `url`, or None if it is not cached."""
+        with self._lock:
+            self._refresh_index()
+            entry = self._index.get(url)
+        if entry and os.path.exists(self.object_path(entry["sha256"])):
+            return entry
+        return None
+
+    def path_for(self, url):
+        """Return the local path of the cached copy of `url`, or None."""
+        entry = self.entry(url)
+        return self.object_path(entry["sha256"]) if entry else None
+
+    def cached(self, url):
+        """Return (path, fresh) for the cached copy of `url`, or (None, False).
+
+        `fresh` is False once the copy is due for revalidation. The copy is
+        marked as recently used either way.
+        """
+        entry = self.entry(url)
+        if entry is None:
+            return None, False
+        fresh = time.time() - entry.get("validated_at", 0) < self.revalidate_after
+        if fresh:
+            self._count("fresh")
+        return self._touch(entry), fresh
+
+    def entries(self):
+        """Return a snapshot of the whole URL index."""
+        with self._lock:
+            self._refresh_index()
+            return dict(self._index)
+
+    # --- Fetching ---
+
+    def fetch(self, url, timeout=15, session=None, progress=None):
+        """Return the local path of `url`, downloading or revalidating as needed.
+
+        A cached copy younger than `revalidate_after` is served as is. Older
+        copies are revalidated with a conditional request, and any network
+        failure falls back to the cached copy. Raises the request error only
+        when nothing is cached. `progress(received, total)` is called after
+        every chunk downloaded; `total` is None without a Content-Length.
+        """
+        entry = self.entry(url)
+        if entry and time.time() - entry.get("validated_at", 0) < self.revalidate_after:
+            self._count("fresh")
+            return self._touch(entry)
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        http = session or requests
+        try:
+            with http.get(url, headers=headers, timeout=timeout, stream=True) as response:
+                if entry and response.status_code == 304:
+                    entry = self._update_entry(url, dict(entry, validated_at=time.time()))
+                    self._count("revalidated")
+                    return self._touch(entry)
+                response.raise_for_status()
+                path = self._store(url, response, progress)
+                self._count("downloaded")
+                return path
+        except requests.exceptions.RequestException:
+            if entry:
+                self._count("offline")
+                return self._touch(entry)
+            raise
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counters[outcome] += 1
+
+    def stats(self):
+        """Return how fetches were served: fresh from disk, revalidated, downloaded or offline."""
+        with self._lock:
+            return dict(self._counters)
+
+    def _touch(self, entry):
+        """Mark an object as recently used and return its path."""
+        path = self.object_path(entry["sha256"])
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return path
+
+    def _update_entry(self, url, entry):
+        with self._lock:
+            self._refresh_index()
+            self._index[url] = entry
+            self._save_index()
+        return entry
+
+    def _store(self, url, response, progress=None):
+        """Stream a response body into the cache and index it under `url`."""
+        total = response.headers.get("Content-Length")
+        total = int(total) if total and total.isdigit() else None
+        received = 0
+        fd, tmp_path = tempfile.mkstemp(prefix=".download-", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    received += len(chunk)
+                    if progress:
+                        progress(received, total)
+            return self.store_file(
+                url,
+                tmp_path,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def store_file(self, url, file_path, etag=None, last_modified=None):
+        """Move a fully downloaded file into the cache and index it under `url`."""
+        digest = hashlib.sha256()
+        size = 0
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        path = self.object_path(digest.hexdigest())
+        os.replace(file_path, path)
+
+        self._update_entry(url, {
+            "sha256": digest.hexdigest(),
+            "size": size,
+            "etag": etag,
+            "last_modified": last_modified,
+            "validated_at": time.time(),
+        })
+        self.evict()
+        return path
+
+    # --- Eviction ---
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self._objects())
+
+    def _objects(self):
+        """Yield (path, size, last_used) for every cached object."""
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pdf"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """Remove least recently used objects until the cache fits its byte budget."""
+        objects = sorted(self._objects(), key=lambda o: o[2])
+        total = sum(size for _, size, _ in objects)
+        if total <= self.max_bytes:
+            return
+
+        evicted = set()
+        # Never evict the most recently used object, even if it alone exceeds the budget
+        for path, size, _ in objects[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            evicted.add(os.path.basename(path)[:-len(".pdf")])
+            total -= size
+
+        with self._lock:
+            self._refresh_index()
+            self._index = {url: e for url, e in self._index.items() if e["sha256"] not in evicted}
+            self._save_index()
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an uploaded PDF exceeds the upload size limit."""
+
+
+class UploadedPDFs(SharedIndex):
+    """PDFs uploaded by reviewers, stored by content hash and linked to papers.
+
+    Uploads are streamed to disk in chunks, so the size limit is enforced
+    before the whole file is written, and identical files uploaded by
+    different reviewers share one object. The index maps each paper id to the
+    SHA-256 of its latest upload, so every later session finds the copy on
+    disk. Unlike the PDF cache, uploads are never evicted.
+    """
+
+    def __init__(self, upload_dir=UPLOAD_DIR, max_bytes=None):
+        self.upload_dir = upload_dir
+        self.index_path = os.path.join(upload_dir, INDEX_FILE)
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("PDF_UPLOAD_MAX_BYTES", DEFAULT_UPLOAD_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = {}
+        self._index_mtime = None
+        self._counters = {"stored": 0, "deduplicated": 0, "rejected": 0}
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.upload_dir, f"{digest}.pdf")
+
+    def entry(self, paper_id):
+        """Return the index entry of the upload linked to `paper_id`, or None."""
+        with self._lock:
+            self._refresh_index()
+            entry = self._index.get(str(paper_id))
+        if entry and os.path.exists(self.object_path(entry["sha256"])):
+            return entry
+        return None
+
+    def path_for(self, paper_id):
+        """Return the local path of the upload linked to `paper_id`, or None."""
+        entry = self.entry(paper_id)
+        return self.object_path(entry["sha256"]) if entry else None
+
+    def store(self, paper_id, stream, name=None):
+        """Stream a file object to disk and link it to `paper_id`; return its path.
+
+        Raises UploadTooLarge as soon as more than `max_bytes` have been read.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(prefix=".upload-", dir=self.upload_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        self._count("rejected")
+                        raise UploadTooLarge(
+                            f"The PDF is larger than the {self.max_bytes / 1024 ** 2:.0f} MB upload limit."
+                        )
+                    digest.update(chunk)
+                    f.write(chunk)
+            path = self.object_path(digest.hexdigest())
+            if os.path.exists(path):
+                self._count("deduplicated")
+            else:
+                os.replace(tmp_path, path)
+                self._count("stored")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with self._lock:
+            self._refresh_index()
+            previous = self._index.get(str(paper_id))
+            self._index[str(paper_id)] = {
+                "sha256": digest.hexdigest(),
+                "size": size,
+                "name": name,
+                "uploaded_at": time.time(),
+            }
+            self._save_index()
+            if previous and not any(e["sha256"] == previous["sha256"] for e in self._index.values()):
+                # The replaced upload is no longer linked to any paper
+                try:
+                    os.remove(self.object_path(previous["sha256"]))
+                except FileNotFoundError:
+                    pass
+        return path
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counters[outcome] += 1
+
+    def stats(self):
+        """Return how uploads were handled: stored, deduplicated or rejected as too large."""
+        with self._lock:
+            return dict(self._counters)
+
+
+class MemoryPDFCache:
+    """Process-wide LRU cache of local PDF bytes keyed by (path, mtime, size).
+
+    Files are read through a memory map on a miss, and the resulting bytes
+    object is shared by every session until the file changes or is evicted.
+    """
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("PDF_MEMORY_CACHE_MAX_BYTES", DEFAULT_MEMORY_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+
+    @staticmethod
+    def _map_file(path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+
+    def read(self, path):
+        """Return the bytes of the file at `path`, from memory when unchanged."""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.bytes_served += len(data)
+                return data
+
+        data = self._map_file(path)
+        with self._lock:
+            self.misses += 1
+            self.bytes_served += len(data)
+            if len(data) <= self.max_bytes and key not in self._entries:
+                self._entries[key] = data
+                self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return data
+
+    def stats(self):
+        """Return hit, miss and size counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_served": self.bytes_served,
+                "entries": len(self._entries),
+                "bytes_cached": self._size,
+            }
+
+
+def populate_local_pdfs(cache, config_path=CONFIG_FILE):
+    """Point `local_pdf` of every paper with a cached `pdf_url` at its cached copy.
+
+    Returns the number of papers updated. The config file is only rewritten
+    when something changed.
+    """
+    if not os.path.exists(config_path):
+        return 0
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+
+    updated = 0
+    for paper in config.get("papers", []):
+        path = cache.path_for(paper.get("pdf_url") or "")
+        if path and paper.get("local_pdf") != path:
+            paper["local_pdf"] = path
+            updated += 1
+
+    if updated:
+        atomic_write_json(config_path, config, indent=2)
+    return updated
@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+
+# Download threads shared by every session
+FETCH_WORKERS = 4
+# URLs waiting for a download thread; further requests are turned away until it drains
+FETCH_QUEUE_SIZE = 32
+# Seconds a failed URL is answered from the failure instead of being fetched again
+FAILURE_TTL = 60
+FETCH_TIMEOUT = 15
+
+
+class FetchJob:
+    """Progress of one URL download, shared by every session waiting for it."""
+
+    def __init__(self, url, state="queued", path=None):
+        self.url = url
+        self.state = state
+        self.path = path
+        self.received = 0
+        self.total = None
+        self.error = None
+        self.retry_at = None
+
+    @property
+    def done(self):
+        return self.state in ("ready", "failed")
+
+    @property
+    def fraction(self):
+        """Share of the body received, or None while its size is unknown."""
+        return min(self.received / self.total, 1.0) if self.total else None
+
+    def _progress(self, received, total):
+        self.state = "downloading"
+        self.received = received
+        self.total = total
+
+
+class PDFFetcher:
+    """Thread pool downloading PDFs into a PDFCache off the script thread.
+
+    `request()` never blocks on the network: a cached copy is returned at
+    once, and is revalidated in the background once it is due. Otherwise the
+    URL is queued and the caller gets a FetchJob to poll. Concurrent requests
+    for a URL share one job, whichever session made them. A failed URL keeps
+    its failed job for `failure_ttl` seconds, so reruns do not hammer a dead
+    mirror. The queue is bounded; when it is full the request is turned away
+    and can be repeated on a later rerun.
+    """
+
+    def __init__(self, cache, workers=FETCH_WORKERS, queue_size=FETCH_QUEUE_SIZE,
+                 failure_ttl=FAILURE_TTL, timeout=FETCH_TIMEOUT):
+        self.cache = cache
+        self.failure_ttl = failure_ttl
+        self.timeout = timeout
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        # url -> FetchJob queued or downloading
+        self._jobs = {}
+        # url -> failed FetchJob, until its retry_at
+        self._failures = {}
+        self._counters = {"queued": 0, "deduped": 0, "rejected": 0, "completed": 0, "failed": 0}
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f"pdf-fetch-{i}", daemon=True).start()
+
+    def request(self, url):
+        """Return the FetchJob of `url`, or None if the queue is full.
+
+        The job is already "ready" when a cached copy exists, and "failed"
+        while a recent failure has not expired.
+        """
+        path, fresh = self.cache.cached(url)
+        if path is not None:
+            if not fresh:
+                self._enqueue(url)
+            return FetchJob(url, "ready", path)
+
+        with self._lock:
+            failure = self._failures.get(url)
+            if failure is not None:
+                if failure.retry_at > time.time():
+                    return failure
+                del self._failures[url]
+        return self._enqueue(url)
+
+    def retry(self, url):
+        """Forget a failure of `url` so the next request fetches it again."""
+        with self._lock:
+            self._failures.pop(url, None)
+
+    def _enqueue(self, url):
+        with self._lock:
+            job = self._jobs.get(url)
+            if job is not None:
+                self._counters["deduped"] += 1
+                return job
+            job = FetchJob(url)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._counters["rejected"] += 1
+                return None
+            self._jobs[url] = job
+            self._counters["queued"] += 1
+            return job
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job.path = self.cache.fetch(job.url, self.timeout, progress=job._progress)
+            except Exception as e:
+                now = time.time()
+                job.error = str(e)
+                job.retry_at = now + self.failure_ttl
+                job.state = "failed"
+                with self._lock:
+                    del self._jobs[job.url]
+                    self._failures = {url: f for url, f in self._failures.items() if f.retry_at > now}
+                    self._failures[job.url] = job
+                    self._counters["failed"] += 1
+            else:
+                job.state = "ready"
+                with self._lock:
+                    del self._jobs[job.url]
+                    self._counters["completed"] += 1
+
+    def stats(self):
+        """Return queue depth, downloads in flight, failures remembered and job counters."""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "in_flight": len(self._jobs),
+                "failures_cached": len(self._failures),
+                **self._counters,
+            }
@@ -0,0 +1,42 @@
+import io
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+# Documents longer than this are rendered in page windows unless the paper sets page_window
+LAZY_PAGE_THRESHOLD = 50
+DEFAULT_PAGE_WINDOW = 10
+DEFAULT_PAGE_PREFETCH = 2
+
+
+def page_count(pdf_path):
+    """Return the number of pages in a PDF file."""
+    return len(PdfReader(pdf_path).pages)
+
+
+def extract_page_range(pdf_path, start, end):
+    """Return a standalone PDF holding pages [start, end) of `pdf_path`."""
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for page in reader.pages[start:end]:
+        writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def window_settings(paper):
+    """Return (window size, prefetch margin) in pages for a paper."""
+    window = int(paper.get("page_window") or DEFAULT_PAGE_WINDOW)
+    prefetch = int(paper.get("page_prefetch", DEFAULT_PAGE_PREFETCH))
+    return max(window, 1), max(prefetch, 0)
+
+
+def use_page_windows(paper, total_pages):
+    """Return True if a document should be sent to the browser in page windows."""
+    if paper.get("page_window"):
+        return total_pages > int(paper["page_window"])
+    return total_pages > LAZY_PAGE_THRESHOLD
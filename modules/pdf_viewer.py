@@ -1,7 +1,18 @@
 import streamlit as st
 import base64
 import os
-import requests
+from modules.metrics import fragment_reruns, registry, timed
+from modules.pdf_cache import MemoryPDFCache, PDFCache, UploadedPDFs, UploadTooLarge
+from modules.pdf_fetch import PDFFetcher
+from modules.previews import PreviewCache, paper_pdf_source
+from modules.static_pdfs import PublishedPDFs
+from modules.pdf_pages import (
+    PYPDF_AVAILABLE,
+    extract_page_range,
+    page_count,
+    use_page_windows,
+    window_settings,
+)
 
 try:
     from streamlit_pdf_viewer import pdf_viewer
@@ -9,17 +20,154 @@ try:
 except ImportError:
     PDF_VIEWER_AVAILABLE = False
 
-@st.cache_data(show_spinner="Fetching PDF...")
-def fetch_pdf_from_url(url):
-    """Fetch PDF content from a URL and return its bytes."""
-    try:
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        return response.content
-    except requests.exceptions.RequestException as e:
-        st.error(f"Failed to fetch PDF: {e}")
+# Seconds between progress updates of a PDF being downloaded
+DOWNLOAD_POLL_SECONDS = 1.0
+
+@st.cache_resource
+def get_pdf_cache():
+    """Return the on-disk PDF cache shared by all sessions."""
+    return PDFCache()
+
+@st.cache_resource
+def get_pdf_fetcher():
+    """Return the background PDF downloader shared by all sessions."""
+    return PDFFetcher(get_pdf_cache())
+
+@st.cache_resource
+def get_memory_pdf_cache():
+    """Return the in-memory PDF byte cache shared by all sessions."""
+    return MemoryPDFCache()
+
+@st.cache_resource
+def get_uploaded_pdfs():
+    """Return the store of PDFs uploaded by reviewers, shared by all sessions."""
+    return UploadedPDFs()
+
+@st.cache_resource
+def get_preview_cache():
+    """Return the store of PDF previews shown in the sidebar, shared by all sessions."""
+    return PreviewCache()
+
+def get_paper_preview(paper):
+    """Return (preview, thumbnail path or None) for a paper whose PDF is on disk, else None.
+
+    Never downloads; a missing preview is queued and shows up on a later rerun.
+    """
+    source = paper_pdf_source(paper, get_pdf_cache(), get_uploaded_pdfs())
+    if source is None:
         return None
+    previews = get_preview_cache()
+    preview = previews.request(*source)
+    if preview is None:
+        return None
+    return preview, previews.thumbnail_path(source[1]) if preview["thumbnail"] else None
+
+@st.cache_resource
+def get_published_pdfs():
+    """Return the static directory PDFs are published to for URL delivery."""
+    return PublishedPDFs()
+
+registry.register_collector("pdf_disk_cache", lambda: get_pdf_cache().stats())
+registry.register_collector("pdf_memory_cache", lambda: get_memory_pdf_cache().stats())
+registry.register_collector("pdf_fetcher", lambda: get_pdf_fetcher().stats())
+registry.register_collector("pdf_uploads", lambda: get_uploaded_pdfs().stats())
+registry.register_collector("pdf_previews", lambda: get_preview_cache().stats())
+
+def static_serving_enabled():
+    """Return True if Streamlit serves ./static, so PDFs can be referenced by URL."""
+    return bool(st.get_option("server.enableStaticServing"))
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def get_page_count(pdf_path, mtime_ns, size):
+    """Return the page count of a PDF, cached until the file changes."""
+    return page_count(pdf_path)
+
+@st.cache_resource(max_entries=64, show_spinner="Preparing pages...")
+def get_page_range(pdf_path, mtime_ns, size, start, end):
+    """Return pages [start, end) of a PDF as a standalone document, cached across sessions."""
+    return extract_page_range(pdf_path, start, end)
+
+def render_pdf_document(pdf_path=None, pdf_bytes=None, paper=None):
+    """Display a PDF given either its local path or its bytes.
+
+    Long documents on disk are sent in page windows when a paper is given.
+    Otherwise the whole document opens at the page a search hit selected.
+    """
+    if pdf_path and paper and PYPDF_AVAILABLE:
+        stat = os.stat(pdf_path)
+        try:
+            total_pages = get_page_count(pdf_path, stat.st_mtime_ns, stat.st_size)
+        except Exception:
+            total_pages = None
+        if total_pages and use_page_windows(paper, total_pages):
+            render_pdf_window(pdf_path, paper, total_pages, stat)
+            return
+    first_page = st.session_state.get(f"pdf_page_{paper['id']}", 1) if paper else 1
+    display_pdf(pdf_path=pdf_path, pdf_bytes=pdf_bytes, first_page=first_page)
+
+def render_pdf_window(pdf_path, paper, total_pages, stat):
+    """Display only a window of pages plus a prefetch margin, with controls to move it."""
+    window, prefetch = window_settings(paper)
+    state_key = f"pdf_window_{paper['id']}"
+    start, end = st.session_state.get(state_key, (0, min(window, total_pages)))
+
+    page_key = f"pdf_page_{paper['id']}"
+    if page_key not in st.session_state:
+        st.session_state[page_key] = start + 1
+    nav_prev, nav_page, nav_more = st.columns([1, 2, 1])
+    with nav_page:
+        page = st.number_input("Go to page", min_value=1, max_value=total_pages, key=page_key)
+    if not start <= page - 1 < end:
+        start = (page - 1) // window * window
+        end = min(start + window, total_pages)
+    with nav_prev:
+        if st.button("⬆️ Earlier pages", key=f"pdf_prev_{paper['id']}", disabled=start == 0):
+            start = max(start - window, 0)
+    with nav_more:
+        if st.button("⬇️ Load more", key=f"pdf_more_{paper['id']}", disabled=end >= total_pages):
+            end = min(end + window, total_pages)
+    st.session_state[state_key] = (start, end)
+
+    sent_end = min(end + prefetch, total_pages)
+    st.caption(f"Showing pages {start + 1}–{end} of {total_pages}")
+    pdf_bytes = get_page_range(pdf_path, stat.st_mtime_ns, stat.st_size, start, sent_end)
+    display_pdf(pdf_bytes=pdf_bytes, first_page=page - start if start <= page - 1 < sent_end else 1)
 
+def display_pdf(pdf_path=None, pdf_bytes=None, first_page=1):
+    """Send a whole PDF to the browser.
+
+    With static serving enabled the iframe references a URL, so the browser
+    streams the document with range requests and caches it across reruns.
+    Otherwise the bytes are sent to the pdf viewer component or inlined as a
+    base64 data URI.
+    """
+    if static_serving_enabled():
+        published = get_published_pdfs()
+        url = published.publish_file(pdf_path) if pdf_path else published.publish_bytes(pdf_bytes)
+        if first_page > 1:
+            url += f"#page={first_page}"
+        pdf_display = f'<iframe src="{url}" width="100%" height="1200px" type="application/pdf"></iframe>'
+        st.markdown(pdf_display, unsafe_allow_html=True)
+        return
+
+    if pdf_bytes is None:
+        pdf_bytes = read_pdf_bytes(pdf_path)
+    if PDF_VIEWER_AVAILABLE:
+        # Set a large height; the parent div will handle scrolling
+        pdf_viewer(pdf_bytes, height=1200, scroll_to_page=first_page if first_page > 1 else None)
+    else:
+        base64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
+        # Set a large height in pixels for the iframe
+        pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}#page={first_page}" width="100%" height="1200px" type="application/pdf"></iframe>'
+        st.markdown(pdf_display, unsafe_allow_html=True)
+
+def read_pdf_bytes(path):
+    """Read a local PDF file and return its bytes, reusing them while the file is unchanged."""
+    return get_memory_pdf_cache().read(path)
+
+@st.fragment
+@fragment_reruns
+@timed("render_pdf_viewer")
 def render_pdf_viewer(paper):
     """Render PDF viewer for the paper with robust fetching."""
     pdf_url = paper.get('pdf_url', '')
@@ -28,60 +176,98 @@ def render_pdf_viewer(paper):
     if "ncbi.nlm.nih.gov" in pdf_url:
         st.info("This PDF from PubMed Central cannot be embedded directly due to security policies.")
         st.link_button("📄 Open PDF in New Tab", pdf_url, use_container_width=True)
-        render_pdf_upload_option()
+        render_pdf_upload_option(paper)
         return
 
     if pdf_url:
-        pdf_bytes = fetch_pdf_from_url(pdf_url)
-        if pdf_bytes and PDF_VIEWER_AVAILABLE:
-            # Set a large height; the parent div will handle scrolling
-            pdf_viewer(pdf_bytes, height=1200)
-        elif pdf_bytes:
-            base64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
-            # Set a large height in pixels for the iframe
-            pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="1200px" type="application/pdf"></iframe>'
-            st.markdown(pdf_display, unsafe_allow_html=True)
+        job = get_pdf_fetcher().request(pdf_url)
+        cached_path = job.path if job is not None and job.state == "ready" else None
+        if cached_path is None and local_pdf and os.path.exists(local_pdf):
+            render_local_pdf(local_pdf, paper)
+            return
+
+        if cached_path:
+            render_pdf_document(pdf_path=cached_path, paper=paper)
+        elif job is None or not job.done:
+            render_pdf_download(pdf_url)
         else:
+            st.error(f"Failed to fetch PDF: {job.error}")
+            st.button(
+                "🔄 Try again",
+                key=f"pdf_retry_{paper['id']}",
+                on_click=get_pdf_fetcher().retry,
+                args=(pdf_url,),
+            )
             st.warning("Could not display the PDF. Please try opening it in a new tab or uploading a local copy.")
             st.link_button("📄 Open PDF in New Tab", pdf_url, use_container_width=True)
-            render_pdf_upload_option()
+            render_pdf_upload_option(paper)
 
     elif local_pdf and os.path.exists(local_pdf):
-        render_local_pdf(local_pdf)
+        render_local_pdf(local_pdf, paper)
     
     else:
-        st.warning("No PDF source provided for this paper.")
-        render_pdf_upload_option()
+        if get_uploaded_pdfs().entry(paper['id']) is None:
+            st.warning("No PDF source provided for this paper.")
+        render_pdf_upload_option(paper)
+
+@st.fragment(run_every=DOWNLOAD_POLL_SECONDS)
+def render_pdf_download(url):
+    """Placeholder showing the progress of a PDF download; reruns the app once it is done."""
+    job = get_pdf_fetcher().request(url)
+    if job is not None and job.done:
+        st.rerun()
+
+    if job is None:
+        st.info("Waiting for a free download slot...", icon="⏳")
+        return
+    st.info("Downloading the PDF. You can start answering the questions meanwhile.", icon="⏳")
+    received_mb = job.received / 1024 ** 2
+    if job.total:
+        st.progress(job.fraction, text=f"{received_mb:.1f} of {job.total / 1024 ** 2:.1f} MB")
+    else:
+        st.progress(0.0, text=f"{received_mb:.1f} MB")
 
-def render_local_pdf(pdf_path):
+def render_local_pdf(pdf_path, paper=None):
     """Render local PDF file."""
     try:
-        with open(pdf_path, "rb") as pdf_file:
-            pdf_bytes = pdf_file.read()
-            if PDF_VIEWER_AVAILABLE:
-                pdf_viewer(pdf_bytes, height=1200)
-            else:
-                base64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
-                pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="1200px" type="application/pdf"></iframe>'
-                st.markdown(pdf_display, unsafe_allow_html=True)
+        render_pdf_document(pdf_path=pdf_path, paper=paper)
     except Exception as e:
         st.error(f"Error loading local PDF: {e}")
 
-def render_pdf_upload_option():
-    """Render an option to upload a PDF locally."""
+def render_pdf_upload_option(paper):
+    """Render an option to upload a local copy of the PDF, and the copy uploaded so far.
+
+    Uploads are stored on disk once and linked to the paper, so every later
+    session, of any reviewer, shows the stored copy without a new upload.
+    """
+    uploads = get_uploaded_pdfs()
     st.markdown("---")
-    st.markdown("**Or, upload a local copy of the PDF:**")
+    uploaded = uploads.entry(paper['id'])
+    st.markdown("**Or, upload a local copy of the PDF:**" if uploaded is None else "**Replace the uploaded copy of the PDF:**")
     uploaded_file = st.file_uploader(
         "Choose a PDF file",
         type="pdf",
-        key=f"pdf_upload_{st.session_state.get('current_paper_id', 0)}"
+        key=f"pdf_upload_{paper['id']}"
     )
-    
+
+    # Each upload is streamed to disk once: the file ids stored or rejected so far
+    stored_key = f"pdf_upload_stored_{paper['id']}"
+    rejected_key = f"pdf_upload_rejected_{paper['id']}"
     if uploaded_file is not None:
-        pdf_bytes = uploaded_file.getvalue()
-        if PDF_VIEWER_AVAILABLE:
-            pdf_viewer(pdf_bytes, height=1200)
-        else:
-            base64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
-            pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="1200px" type="application/pdf"></iframe>'
-            st.markdown(pdf_display, unsafe_allow_html=True)
\ No newline at end of file
+        rejected = st.session_state.get(rejected_key)
+        if rejected is not None and rejected[0] == uploaded_file.file_id:
+            st.error(rejected[1])
+        elif st.session_state.get(stored_key) != uploaded_file.file_id:
+            try:
+                uploads.store(paper['id'], uploaded_file, name=uploaded_file.name)
+            except UploadTooLarge as e:
+                st.session_state[rejected_key] = (uploaded_file.file_id, str(e))
+                st.error(str(e))
+            else:
+                st.session_state[stored_key] = uploaded_file.file_id
+                uploaded = uploads.entry(paper['id'])
+
+    if uploaded is not None:
+        if uploaded.get("name"):
+            st.caption(f"Showing the uploaded copy `{uploaded['name']}`")
+        render_local_pdf(uploads.object_path(uploaded["sha256"]), paper)
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""Warm the on-disk PDF cache for every paper in papers_config.json.
+
+Usage:
+    python -m modules.prefetch [--config papers_config.json] [--workers 8]
+
+Downloads run concurrently on a bounded thread pool with one pooled HTTP
+session per worker. Requests to the same host are spaced by a minimum
+interval, failures are retried with exponential backoff, and interrupted
+downloads resume from their partial file with a Range request. The resumed
+request carries If-Range with the validator of the partial body, so a
+document changed in the meantime is downloaded again from the start. The
+exit status is non-zero if any URL failed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+
+from modules.pdf_cache import CHUNK_SIZE, CONFIG_FILE, PDF_CACHE_DIR, PDFCache, populate_local_pdfs
+from modules.storage import atomic_write_json
+
+PARTIAL_DIR = "partial"
+
+
+def if_range_validator(validators):
+    """Return the If-Range value tying a partial body to one version of the document, or None.
+
+    Weak ETags are not allowed in If-Range, so Last-Modified is used instead.
+    """
+    etag = validators.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validators.get("last_modified")
+
+
+def load_validators(path):
+    """Return the ETag and Last-Modified stored next to a partial download, or {}."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+class HostRateLimiter:
+    """Space out requests to the same host by at least `min_interval` seconds."""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Progress:
+    """Thread-safe progress and throughput reporting."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes += count
+
+    def finish(self, url, error=None):
+        with self._lock:
+            self.done += 1
+            if error:
+                self.failed += 1
+            status = f"FAILED ({error})" if error else "ok"
+            print(f"[{self.done}/{self.total}] {status}: {url} — {self.summary()}", flush=True)
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        megabytes = self.bytes / 1024 ** 2
+        return f"{megabytes:.1f} MB in {elapsed:.1f}s ({megabytes / elapsed:.2f} MB/s)"
+
+
+class Prefetcher:
+    """Download a list of PDF URLs into a PDFCache."""
+
+    def __init__(self, cache, workers=8, per_host_interval=0.5, retries=3, backoff=1.0, timeout=30, force=False):
+        self.cache = cache
+        self.workers = workers
+        self.rate_limiter = HostRateLimiter(per_host_interval)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.force = force
+        self.partial_dir = os.path.join(cache.cache_dir, PARTIAL_DIR)
+        self._local = threading.local()
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def partial_path(self, url):
+        return os.path.join(self.partial_dir, hashlib.sha1(url.encode()).hexdigest() + ".part")
+
+    def _download(self, url, progress):
+        """Download `url`, resuming an earlier partial file when the server allows it."""
+        part_path = self.partial_path(url)
+        validators_path = f"{part_path}.json"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        validators = load_validators(validators_path) if offset else {}
+        if_range = if_range_validator(validators)
+        # A partial body that cannot be tied to a version of the document is not resumed
+        headers = {"Range": f"bytes={offset}-", "If-Range": if_range} if offset and if_range else {}
+        if not headers:
+            offset = 0
+
+        self.rate_limiter.wait(url)
+        with self._session().get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if offset and response.status_code == 416:
+                # The partial file already holds the whole body
+                pass
+            else:
+                response.raise_for_status()
+                resumed = offset and response.status_code == 206
+                if not resumed:
+                    # A full body, also sent when If-Range no longer matches
+                    validators = {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                    }
+                    atomic_write_json(validators_path, validators)
+                with open(part_path, 'ab' if resumed else 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        progress.add_bytes(len(chunk))
+            path = self.cache.store_file(
+                url,
+                part_path,
+                etag=validators.get("etag"),
+                last_modified=validators.get("last_modified"),
+            )
+        if os.path.exists(validators_path):
+            os.remove(validators_path)
+        return path
+
+    def fetch(self, url, progress):
+        """Fetch one URL with retries and exponential backoff."""
+        if not self.force and self.cache.entry(url):
+            return self.cache.path_for(url)
+        for attempt in range(self.retries + 1):
+            try:
+                return self._download(url, progress)
+            except requests.exceptions.RequestException as e:
+                status = e.response.status_code if e.response is not None else None
+                if attempt == self.retries or (status and 400 <= status < 500 and status != 429):
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def run(self, urls):
+        """Fetch every URL concurrently and return the Progress of the run."""
+        urls = list(dict.fromkeys(urls))
+        progress = Progress(len(urls))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.fetch, url, progress): url for url in urls}
+            for future in as_completed(futures):
+                error = future.exception()
+                progress.finish(futures[future], error)
+        return progress
+
+
+def catalog_urls(config_path=CONFIG_FILE):
+    """Return the pdf_url of every paper in the config file."""
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    return [p["pdf_url"] for p in config.get("papers", []) if p.get("pdf_url")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch every paper PDF into the on-disk cache.")
+    parser.add_argument("--config", default=CONFIG_FILE, help="Paper catalog to read")
+    parser.add_argument("--cache-dir", default=PDF_CACHE_DIR, help="PDF cache directory")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent downloads")
+    parser.add_argument("--per-host-interval", type=float, default=0.5, help="Minimum seconds between requests to one host")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per URL")
+    parser.add_argument("--force", action="store_true", help="Download even if a cached copy exists")
+    args = parser.parse_args()
+
+    cache = PDFCache(args.cache_dir)
+    prefetcher = Prefetcher(
+        cache,
+        workers=args.workers,
+        per_host_interval=args.per_host_interval,
+        retries=args.retries,
+        force=args.force,
+    )
+    progress = prefetcher.run(catalog_urls(args.config))
+    updated = populate_local_pdfs(cache, args.config)
+    print(f"Done: {progress.done - progress.failed} cached, {progress.failed} failed, "
+          f"{updated} local_pdf path(s) updated — {progress.summary()}")
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,248 @@
+"""First-page thumbnails, page counts and opening text of paper PDFs.
+
+Usage:
+    python -m modules.previews [--config papers_config.json] [--workers N]
+
+Previews are built in a process pool from PDFs already on disk (the PDF
+cache, reviewer uploads or local_pdf) and stored in PREVIEW_DIR under the
+SHA-256 of the document, so identical files share a preview and a restart
+only builds previews for documents it has not seen. This command builds
+them for the whole catalog; the app hands the previews missing from the
+sidebar to it in a background process (--stdin). Thumbnails need pypdfium2;
+without it only the page count and opening text are extracted, with pypdf.
+"""
+import argparse
+import itertools
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+from modules.pdf_cache import CONFIG_FILE, PDF_CACHE_DIR, PDFCache, UploadedPDFs, file_digest
+from modules.pdf_pages import PYPDF_AVAILABLE
+from modules.storage import atomic_write_json
+
+PREVIEW_DIR = "pdf_previews"
+# Width of first-page thumbnails in pixels
+THUMBNAIL_WIDTH = 200
+# Characters of first-page text kept for tooltips
+SNIPPET_CHARS = 280
+PREVIEW_WORKERS = 2
+# Seconds before a document whose builder died without a preview is queued again
+FAILED_RETRY_AFTER = 10 * 60
+# Directory `python -m modules.previews` is run from
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_preview(pdf_path, preview_dir, digest, width=THUMBNAIL_WIDTH):
+    """Render the preview of a PDF into `preview_dir` and return it. Runs in a worker process.
+
+    Failures are recorded in the preview, so a broken file is not retried
+    until its content changes.
+    """
+    preview = {"pages": None, "thumbnail": False, "snippet": "", "error": None}
+    try:
+        if PDFIUM_AVAILABLE:
+            pdf = pdfium.PdfDocument(pdf_path)
+            try:
+                preview["pages"] = len(pdf)
+                page = pdf[0]
+                image = page.render(scale=width / page.get_width()).to_pil()
+                thumbnail = os.path.join(preview_dir, f"{digest}.png")
+                tmp_path = f"{thumbnail}.{os.getpid()}.tmp"
+                image.save(tmp_path, format="PNG", optimize=True)
+                os.replace(tmp_path, thumbnail)
+                preview["thumbnail"] = True
+                text = page.get_textpage().get_text_range()
+            finally:
+                pdf.close()
+        elif PYPDF_AVAILABLE:
+            from pypdf import PdfReader
+
+            reader = PdfReader(pdf_path)
+            preview["pages"] = len(reader.pages)
+            text = reader.pages[0].extract_text() if reader.pages else ""
+        else:
+            text = ""
+        preview["snippet"] = " ".join((text or "").split())[:SNIPPET_CHARS]
+    except Exception as e:
+        preview["error"] = str(e) or type(e).__name__
+    atomic_write_json(os.path.join(preview_dir, f"{digest}.json"), preview)
+    return preview
+
+
+def paper_pdf_source(paper, cache, uploads=None):
+    """Return (path, sha256) of a copy of the paper's PDF already on disk, or None.
+
+    Nothing is downloaded. Copies in the PDF cache and uploads are indexed
+    with their hash; other local files are hashed once per process.
+    """
+    entry = cache.entry(paper.get("pdf_url") or "")
+    if entry:
+        return cache.object_path(entry["sha256"]), entry["sha256"]
+    if uploads is not None:
+        upload = uploads.entry(paper["id"])
+        if upload:
+            return uploads.object_path(upload["sha256"]), upload["sha256"]
+    local_pdf = paper.get("local_pdf")
+    if local_pdf and os.path.exists(local_pdf):
+        return local_pdf, file_digest(local_pdf)
+    return None
+
+
+def build_previews(pending, preview_dir, workers=None):
+    """Build the previews of {sha256: path} in a process pool; return (built, failed)."""
+    failed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for preview in pool.map(build_preview, pending.values(), itertools.repeat(preview_dir), pending):
+                if preview["error"]:
+                    failed += 1
+    return len(pending) - failed, failed
+
+
+class PreviewCache:
+    """Previews of PDFs keyed by content hash, built in the background.
+
+    `request()` returns a stored preview at once, or queues the document and
+    returns None; the preview is there on a later rerun. Queued documents
+    are built in batches by `python -m modules.previews --stdin`: a process
+    pool started from the app would re-run the Streamlit script, which is
+    __main__ during a rerun, in every worker.
+    """
+
+    def __init__(self, preview_dir=PREVIEW_DIR, workers=PREVIEW_WORKERS):
+        self.preview_dir = preview_dir
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._previews = {}
+        self._pending = set()
+        # digest -> (monotonic time, error preview) of builds that wrote nothing
+        self._failures = {}
+        self._counters = {"built": 0, "failed": 0}
+        os.makedirs(preview_dir, exist_ok=True)
+
+    def thumbnail_path(self, digest):
+        return os.path.join(self.preview_dir, f"{digest}.png")
+
+    def get(self, digest):
+        """Return the stored preview of `digest`, or None."""
+        preview = self._previews.get(digest)
+        if preview is not None:
+            return preview
+        try:
+            with open(os.path.join(self.preview_dir, f"{digest}.json"), 'r') as f:
+                preview = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        self._previews[digest] = preview
+        return preview
+
+    def request(self, pdf_path, digest):
+        """Return the preview of a PDF, or None while it is being built.
+
+        If the builder died before writing the preview, an error preview is
+        returned until FAILED_RETRY_AFTER has passed.
+        """
+        preview = self.get(digest)
+        if preview is not None:
+            return preview
+        with self._lock:
+            failure = self._failures.get(digest)
+            if failure is not None:
+                if time.monotonic() - failure[0] < FAILED_RETRY_AFTER:
+                    return failure[1]
+                del self._failures[digest]
+            if digest in self._pending:
+                return None
+            self._pending.add(digest)
+            # The builder does not share the app's working directory
+            self._queue.put((os.path.abspath(pdf_path), digest))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="pdf-previews", daemon=True)
+                self._thread.start()
+        return None
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            command = [sys.executable, "-m", "modules.previews", "--stdin",
+                       "--previews", os.path.abspath(self.preview_dir), "--workers", str(self.workers)]
+            error = "the preview builder stopped before this document"
+            try:
+                result = subprocess.run(command, input="".join(json.dumps(item) + "\n" for item in batch), text=True,
+                                        cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                if result.returncode:
+                    error = f"the preview builder exited with status {result.returncode}"
+            except OSError as e:
+                error = f"the preview builder could not start: {e}"
+            with self._lock:
+                for _, digest in batch:
+                    self._pending.discard(digest)
+                    preview = self.get(digest)
+                    if preview is None:
+                        # Not requeued on every rerun; tried again once FAILED_RETRY_AFTER has passed
+                        failed = {"pages": None, "thumbnail": False, "snippet": "", "error": error}
+                        self._failures[digest] = (time.monotonic(), failed)
+                    if preview is None or preview["error"]:
+                        self._counters["failed"] += 1
+                    else:
+                        self._counters["built"] += 1
+
+    def stats(self):
+        """Return previews held in memory, queued and built or failed since startup."""
+        with self._lock:
+            return {"loaded": len(self._previews), "pending": len(self._pending), **self._counters}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build sidebar previews for every paper PDF on disk.")
+    parser.add_argument("--config", default=CONFIG_FILE, help="Paper catalog to read")
+    parser.add_argument("--cache-dir", default=PDF_CACHE_DIR, help="PDF cache directory")
+    parser.add_argument("--previews", default=PREVIEW_DIR, help="Preview directory")
+    parser.add_argument("--workers", type=int, default=None, help="Rendering processes (default: CPU count)")
+    parser.add_argument("--stdin", action="store_true",
+                        help="Build the documents read from stdin as [path, sha256] JSON lines instead of the catalog")
+    args = parser.parse_args()
+
+    previews = PreviewCache(args.previews)
+    pending = {}
+    unchanged = 0
+    if args.stdin:
+        sources = (json.loads(line) for line in sys.stdin if line.strip())
+    else:
+        with open(args.config, 'r') as f:
+            papers = json.load(f).get("papers", [])
+        cache = PDFCache(args.cache_dir)
+        uploads = UploadedPDFs()
+        sources = filter(None, (paper_pdf_source(paper, cache, uploads) for paper in papers))
+    for path, digest in sources:
+        if previews.get(digest) is not None:
+            unchanged += 1
+        else:
+            pending[digest] = path
+
+    started = time.monotonic()
+    built, failed = build_previews(pending, args.previews, args.workers)
+    print(f"Built {built}, unchanged {unchanged}, failed {failed} in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
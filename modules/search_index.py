@@ -0,0 +1,206 @@
+"""Full-text search over the text of every cached or local paper PDF.
+
+Usage:
+    python -m modules.search_index [--config papers_config.json] [--workers N]
+
+Text is extracted page by page in a process pool and stored in an SQLite
+FTS5 index. Papers are only re-extracted when the SHA-256 of their PDF
+changes, so repeated runs are incremental.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from modules.pdf_cache import CONFIG_FILE, PDF_CACHE_DIR, PDFCache, file_digest
+
+SEARCH_DB = "search_index.db"
+# Page hits fetched from FTS5 before grouping them by paper
+MAX_PAGE_HITS = 200
+
+
+def extract_page_texts(pdf_path):
+    """Return the text of every page of a PDF. Runs in a worker process."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def paper_pdf_path(paper, cache):
+    """Return the local PDF of a paper, preferring the cached copy of its pdf_url."""
+    path = cache.path_for(paper.get("pdf_url") or "")
+    if path:
+        return path
+    local_pdf = paper.get("local_pdf")
+    if local_pdf and os.path.exists(local_pdf):
+        return local_pdf
+    return None
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query: all terms required, last one as a prefix."""
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class SearchIndex:
+    """Inverted index of paper page texts backed by SQLite FTS5."""
+
+    def __init__(self, path=SEARCH_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    paper_id TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    pages INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+                    paper_id UNINDEXED,
+                    page UNINDEXED,
+                    body,
+                    tokenize = 'porter unicode61'
+                );
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def indexed_digests(self):
+        """Return {paper_id: sha256} of every indexed paper."""
+        return dict(self._connect().execute("SELECT paper_id, sha256 FROM documents"))
+
+    def replace_document(self, paper_id, sha256, page_texts):
+        """Store the page texts of one paper, replacing any earlier version."""
+        paper_id = str(paper_id)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pages_fts WHERE paper_id = ?", (paper_id,))
+            conn.executemany(
+                "INSERT INTO pages_fts (paper_id, page, body) VALUES (?, ?, ?)",
+                [(paper_id, page_number, text) for page_number, text in enumerate(page_texts, start=1)],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (paper_id, sha256, pages, indexed_at) VALUES (?, ?, ?, ?)",
+                (paper_id, sha256, len(page_texts), time.time()),
+            )
+
+    def remove_document(self, paper_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pages_fts WHERE paper_id = ?", (str(paper_id),))
+            conn.execute("DELETE FROM documents WHERE paper_id = ?", (str(paper_id),))
+
+    def search(self, text, limit=20):
+        """Return papers ranked by their best matching page.
+
+        Each result is a dict with paper_id, score (lower is better, as with
+        FTS5's bm25), the matching page numbers in rank order and a snippet
+        of the best page.
+        """
+        query = build_match_query(text)
+        if query is None:
+            return []
+        rows = self._connect().execute(
+            """
+            SELECT paper_id, page, bm25(pages_fts) AS score,
+                   snippet(pages_fts, 2, '**', '**', '…', 12)
+            FROM pages_fts
+            WHERE pages_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+            """,
+            (query, MAX_PAGE_HITS),
+        ).fetchall()
+
+        results = {}
+        for paper_id, page, score, snippet in rows:
+            result = results.get(paper_id)
+            if result is None:
+                if len(results) == limit:
+                    continue
+                result = results[paper_id] = {
+                    "paper_id": paper_id,
+                    "score": score,
+                    "pages": [],
+                    "snippet": snippet,
+                }
+            result["pages"].append(int(page))
+        return list(results.values())
+
+
+def update_index(papers, index, cache, workers=None):
+    """Extract and index every paper whose PDF changed since the last run.
+
+    Returns a dict with the number of papers indexed, unchanged and failed.
+    """
+    known = index.indexed_digests()
+    pending = {}
+    unchanged = 0
+    for paper in papers:
+        path = paper_pdf_path(paper, cache)
+        if path is None:
+            continue
+        digest = file_digest(path)
+        if known.get(str(paper["id"])) == digest:
+            unchanged += 1
+            continue
+        pending[str(paper["id"])] = (path, digest)
+
+    indexed = failed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(extract_page_texts, path): (paper_id, digest)
+                for paper_id, (path, digest) in pending.items()
+            }
+            for future in as_completed(futures):
+                paper_id, digest = futures[future]
+                try:
+                    page_texts = future.result()
+                except Exception as e:
+                    print(f"Failed to extract paper {paper_id}: {e}")
+                    failed += 1
+                    continue
+                index.replace_document(paper_id, digest, page_texts)
+                indexed += 1
+
+    catalog_ids = {str(p["id"]) for p in papers}
+    for paper_id in set(known) - catalog_ids:
+        index.remove_document(paper_id)
+
+    return {"indexed": indexed, "unchanged": unchanged, "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the full-text search index for the paper catalog.")
+    parser.add_argument("--config", default=CONFIG_FILE, help="Paper catalog to read")
+    parser.add_argument("--cache-dir", default=PDF_CACHE_DIR, help="PDF cache directory")
+    parser.add_argument("--index", default=SEARCH_DB, help="Search index database")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count)")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        papers = json.load(f).get("papers", [])
+    started = time.monotonic()
+    counts = update_index(papers, SearchIndex(args.index), PDFCache(args.cache_dir), args.workers)
+    print(f"Indexed {counts['indexed']}, unchanged {counts['unchanged']}, failed {counts['failed']} "
+          f"in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
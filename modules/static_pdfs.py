@@ -0,0 +1,81 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from modules.pdf_cache import file_digest
+
+# Streamlit serves files in ./static at app/static/ when server.enableStaticServing is on
+STATIC_DIR = "static"
+PUBLISHED_SUBDIR = "pdfs"
+# Published copies whose source is gone are removed after this many idle seconds
+PUBLISHED_TTL = 24 * 60 * 60
+
+
+class PublishedPDFs:
+    """PDFs exposed through Streamlit's static file route under content-hash names.
+
+    Files already on disk are hard-linked into the static directory, so
+    publishing costs no copy. The browser then fetches the document by URL,
+    with HTTP range requests and its own cache, instead of receiving the bytes
+    over the websocket on every rerun.
+    """
+
+    def __init__(self, static_dir=STATIC_DIR, ttl=PUBLISHED_TTL):
+        self.directory = os.path.join(static_dir, PUBLISHED_SUBDIR)
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _target(self, digest):
+        return os.path.join(self.directory, f"{digest}.pdf")
+
+    @staticmethod
+    def url_for(digest):
+        return f"app/static/{PUBLISHED_SUBDIR}/{digest}.pdf"
+
+    def publish_file(self, path):
+        """Publish a PDF file and return its URL."""
+        digest = file_digest(path)
+        target = self._target(digest)
+        if os.path.exists(target):
+            os.utime(target)
+            return self.url_for(digest)
+
+        tmp_path = target + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            # Different filesystem or no hard link support: fall back to a copy
+            shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, target)
+        self.prune()
+        return self.url_for(digest)
+
+    def publish_bytes(self, pdf_bytes):
+        """Publish in-memory PDF bytes and return their URL."""
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        target = self._target(digest)
+        if os.path.exists(target):
+            os.utime(target)
+            return self.url_for(digest)
+
+        fd, tmp_path = tempfile.mkstemp(prefix=".publish-", dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, target)
+        self.prune()
+        return self.url_for(digest)
+
+    def prune(self):
+        """Remove idle published files that no longer share storage with a source file."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_nlink == 1 and stat.st_mtime < cutoff:
+                os.remove(path)
@@ -0,0 +1,151 @@
+import threading
+
+
+def is_answered(value):
+    """Return True if a response value counts as answered."""
+    return bool(value and str(value).strip())
+
+
+def question_id(response_key):
+    """Map both response key conventions ("3" and "q_3") to the integer question id.
+
+    Keys of neither form are returned as they are.
+    """
+    key = str(response_key)
+    digits = key[2:] if key.startswith("q_") else key
+    return int(digits) if digits.isascii() and digits.isdigit() else response_key
+
+
+def response_key_prefix(responses):
+    """Return the key prefix of the convention `responses` is keyed by: "q_" or ""."""
+    return "q_" if any(str(key).startswith("q_") for key in responses) else ""
+
+
+def rekey_responses(responses, prefix):
+    """Return `responses` keyed by the convention of `prefix` ("" for "3", "q_" for "q_3")."""
+    rekeyed = {}
+    for key, value in responses.items():
+        q_id = question_id(key)
+        rekeyed[f"{prefix}{q_id}" if isinstance(q_id, int) else key] = value
+    return rekeyed
+
+
+def question_categories(record):
+    """Return {response key: category} for the questions of a paper record.
+
+    Both response key conventions are mapped: the bare id used by app.py
+    and the q_<id> key used by st_research.py.
+    """
+    categories = {}
+    for question in record.get("questions", []):
+        categories[str(question["id"])] = question.get("category", "general")
+        categories[f"q_{question['id']}"] = question.get("category", "general")
+    return categories
+
+
+def answered_keys(record):
+    """Return {response key: category} for the answered questions of a paper record."""
+    categories = question_categories(record)
+    return {
+        q_key: categories.get(q_key, "general")
+        for q_key, value in record.get("responses", {}).items()
+        if is_answered(value)
+    }
+
+
+class CompletionStats:
+    """Answered-question counts per paper, per reviewer and per category.
+
+    The set of answered questions of every (reviewer, paper) pair is kept so
+    that a save only adjusts the counters of the questions whose answered
+    state flipped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.answered = {}
+        self.by_paper = {}
+        self.by_reviewer = {}
+        self.by_category = {}
+        self.total = 0
+
+    def _adjust(self, reviewer, paper_id, category, delta):
+        key = (reviewer, paper_id)
+        self.by_paper[key] = self.by_paper.get(key, 0) + delta
+        self.by_reviewer[reviewer] = self.by_reviewer.get(reviewer, 0) + delta
+        self.by_category[category] = self.by_category.get(category, 0) + delta
+        self.total += delta
+
+    def set_answered(self, reviewer, paper_id, answered):
+        """Replace the answered questions of one paper with `answered` ({key: category})."""
+        paper_id = str(paper_id)
+        with self._lock:
+            previous = self.answered.get((reviewer, paper_id), {})
+            for q_key, category in previous.items():
+                if q_key not in answered:
+                    self._adjust(reviewer, paper_id, category, -1)
+            for q_key, category in answered.items():
+                if q_key not in previous:
+                    self._adjust(reviewer, paper_id, category, 1)
+            self.answered[(reviewer, paper_id)] = dict(answered)
+
+    def paper_count(self, reviewer, paper_id):
+        return self.by_paper.get((reviewer, str(paper_id)), 0)
+
+    def paper_records(self):
+        """Return the number of (reviewer, paper) pairs with a saved record."""
+        return len(self.answered)
+
+    def reviewer_count(self):
+        """Return the number of reviewers with at least one saved record."""
+        return len({reviewer for reviewer, _ in self.answered})
+
+    # --- Persistence ---
+
+    def to_json(self):
+        with self._lock:
+            return {
+                "answered": [
+                    {"reviewer": reviewer, "paper_id": paper_id, "questions": questions}
+                    for (reviewer, paper_id), questions in self.answered.items()
+                ]
+            }
+
+    @classmethod
+    def from_json(cls, data):
+        stats = cls()
+        for entry in data.get("answered", []):
+            stats.set_answered(entry["reviewer"], entry["paper_id"], entry["questions"])
+        return stats
+
+
+class MergedStats:
+    """Completion statistics summed over several CompletionStats, keyed by reviewer.
+
+    Only the counters are combined, so merging takes time proportional to
+    the number of parts and categories, not to the number of answers.
+    """
+
+    def __init__(self, parts):
+        self.parts = dict(parts)
+        self.by_reviewer = {}
+        self.by_category = {}
+        self.total = 0
+        for stats in self.parts.values():
+            for reviewer, count in list(stats.by_reviewer.items()):
+                self.by_reviewer[reviewer] = self.by_reviewer.get(reviewer, 0) + count
+            for category, count in list(stats.by_category.items()):
+                self.by_category[category] = self.by_category.get(category, 0) + count
+            self.total += stats.total
+
+    def paper_count(self, reviewer, paper_id):
+        stats = self.parts.get(reviewer)
+        return stats.paper_count(reviewer, paper_id) if stats is not None else 0
+
+    def paper_records(self):
+        """Return the number of (reviewer, paper) pairs with a saved record."""
+        return sum(stats.paper_records() for stats in self.parts.values())
+
+    def reviewer_count(self):
+        """Return the number of reviewers with at least one saved record."""
+        return sum(1 for stats in self.parts.values() if stats.paper_records())
@@ -0,0 +1,816 @@
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from modules.encoding import (
+    SchemaTable,
+    decode_record,
+    decode_snapshot,
+    dumps,
+    encode_record,
+    encode_snapshot,
+    loads,
+)
+from modules.stats import (
+    CompletionStats,
+    MergedStats,
+    answered_keys,
+    is_answered,
+    question_categories,
+    rekey_responses,
+    response_key_prefix,
+)
+
+RESPONSES_FILE = "responses.json"
+RESPONSES_DB = "responses.db"
+# Shards of reviewers other than the default one
+RESPONSES_DIR = "responses"
+SHARD_EXTENSION = ".json"
+JOURNAL_SUFFIX = ".journal"
+COMPACTING_SUFFIX = ".compacting"
+STATS_SUFFIX = ".stats"
+SCHEMAS_SUFFIX = ".schemas"
+LOCK_SUFFIX = ".lock"
+DEFAULT_REVIEWER = "default"
+
+# Compact once the journal holds this many records since the last snapshot
+COMPACT_THRESHOLD = 500
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """Write `data` as JSON to `path` via a temp file and an atomic rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_bytes(path, data):
+    """Write `data` to `path` via a temp file and an atomic rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def file_lock(path, shared=False, blocking=True):
+    """Hold an advisory fcntl lock on the file at `path` for the duration of the block.
+
+    Yields True once the lock is held, or False if `blocking` is off and
+    another holder has it. Without fcntl (Windows) no lock is taken.
+    """
+    if not FCNTL_AVAILABLE:
+        yield True
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(fd, operation if blocking else operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)
+
+
+def file_signature(path):
+    """Return [size, mtime_ns] of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def build_stats(responses, reviewer=DEFAULT_REVIEWER):
+    """Build completion statistics from a {paper_id: record} dictionary."""
+    stats = CompletionStats()
+    for paper_id, record in responses.items():
+        stats.set_answered(reviewer, paper_id, answered_keys(record))
+    return stats
+
+
+def merge_records(stored, record, changed):
+    """Merge a record saved from an outdated version into the stored record.
+
+    Answers to the questions in `changed` come from `record`; every other
+    answer keeps its stored value, so concurrent writers that edited
+    different questions of the same paper both keep their answers.
+    """
+    if stored is None:
+        return record
+    new_responses = record.get("responses", {})
+    # The stored record may have been written under the other response key convention
+    stored_responses = rekey_responses(stored.get("responses", {}), response_key_prefix(new_responses))
+    responses = {**new_responses, **stored_responses}
+    for q_key in changed:
+        if q_key in new_responses:
+            responses[q_key] = new_responses[q_key]
+    answered = sum(1 for value in responses.values() if is_answered(value))
+    return dict(record, responses=responses, completed=answered == len(record.get("questions", [])))
+
+
+class JournalStore:
+    """Responses of one reviewer kept as a JSON snapshot plus an append-only journal.
+
+    Every save appends one record for a single paper to the journal. Loading
+    replays the journal on top of the snapshot, and the journal is
+    periodically folded back into the snapshot in a background thread.
+    Completion statistics are saved next to each snapshot and kept current in
+    memory as records are appended.
+
+    Several processes may share the files. Appends and reads hold an fcntl
+    lock on the journal, compaction holds a second lock, and every record
+    carries a version so a save based on an outdated version is merged
+    question by question instead of overwriting the other writer's answers.
+
+    Records are written in the compact encoding of modules.encoding, with
+    their question lists kept once in a schemas file next to the snapshot.
+    The snapshot and each journal carry the lists they use as well, so the
+    responses can still be read if the schemas file is lost.
+    Snapshots and journals in the previous plain JSON layout are still read.
+    """
+
+    lazy = False
+
+    def __init__(self, path=RESPONSES_FILE, compact_threshold=COMPACT_THRESHOLD, reviewer=DEFAULT_REVIEWER):
+        self.path = path
+        self.reviewer = reviewer
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.compacting_path = self.journal_path + COMPACTING_SUFFIX
+        self.stats_path = path + STATS_SUFFIX
+        self.schemas = SchemaTable(path + SCHEMAS_SUFFIX)
+        self.lock_path = self.journal_path + LOCK_SUFFIX
+        self.compact_lock_path = self.compacting_path + LOCK_SUFFIX
+        self._stats = None
+        self._stats_version = None
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compact_thread = None
+        self._compacting = False
+        self._pending = self._count_records(self.journal_path)
+        # {paper_id: version} and the point up to which the journal was read:
+        # (snapshot signature, journal inode, offset, ends with a newline)
+        self._versions = {}
+        self._tail = None
+        # (snapshot signature, journal inode) and the question lists this process wrote to that journal
+        self._journal_schemas = (None, set())
+        self.conflicts = 0
+
+    @contextmanager
+    def _journal_locked(self, shared=False):
+        with self._lock, file_lock(self.lock_path, shared=shared):
+            yield
+
+    # --- Reading ---
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'rb') as f:
+            return decode_snapshot(f.read(), self.schemas)
+
+    def _decode_entry(self, line):
+        entry = loads(line)
+        if "q" in entry:
+            self.schemas.register(entry["record"]["s"], entry["q"])
+        entry["record"] = decode_record(entry["record"], self.schemas)
+        return entry
+
+    def _journal_entries(self, journal_path):
+        """Yield decoded journal records, skipping a torn trailing line."""
+        try:
+            f = open(journal_path, 'rb')
+        except FileNotFoundError:
+            # A rotated journal vanishes once compaction has folded it into the snapshot
+            return
+        with f:
+            for line in f:
+                try:
+                    yield self._decode_entry(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def _replay(self, journal_path, data):
+        """Apply journal records to `data`."""
+        for entry in self._journal_entries(journal_path):
+            data[str(entry["paper_id"])] = entry["record"]
+        return data
+
+    @staticmethod
+    def _count_records(journal_path):
+        if not os.path.exists(journal_path):
+            return 0
+        with open(journal_path, 'rb') as f:
+            return sum(1 for _ in f)
+
+    def _read_locked(self):
+        """Read snapshot, rotated journal and journal while holding the journal lock.
+
+        The journal lock stops any rotation, so the rotated journal can only
+        disappear once a compaction has written it into the snapshot. Reading
+        it before the snapshot therefore never misses a record.
+        """
+        rotated = list(self._journal_entries(self.compacting_path))
+        data = self._read_snapshot()
+        for entry in rotated:
+            data[str(entry["paper_id"])] = entry["record"]
+        return self._replay(self.journal_path, data)
+
+    def load_all(self):
+        """Return every paper record: snapshot, then any journal replayed on top."""
+        with self._journal_locked(shared=True):
+            return self._read_locked()
+
+    def load_paper(self, paper_id):
+        """Return the record for one paper, or None if it has no responses."""
+        return self.load_all().get(str(paper_id))
+
+    def iter_records(self):
+        """Yield (reviewer, paper_id, record) for every stored paper record."""
+        for paper_id, record in self.load_all().items():
+            yield self.reviewer, paper_id, record
+
+    def version(self):
+        """Return a value that changes whenever the stored responses change."""
+        return tuple(file_signature(p) for p in (self.path, self.compacting_path, self.journal_path))
+
+    # --- Statistics ---
+
+    @property
+    def stats(self):
+        """Completion statistics, reloaded when another process changed the files.
+
+        While this process compacts the store the statistics in memory are
+        returned as they are, since compaction does not change any answer;
+        compact() swaps in fresh ones when it finishes.
+        """
+        stats = self._stats
+        if stats is not None and (self._compacting or self._stats_version == self.version()):
+            return stats
+        with self._journal_locked(shared=True):
+            if self._stats is None or self._stats_version != self.version():
+                self._stats = self._load_stats()
+                self._stats_version = self.version()
+            return self._stats
+
+    def _load_stats(self):
+        """Read the stats saved with the snapshot, then apply the journal on top."""
+        rotated = list(self._journal_entries(self.compacting_path))
+        stats = None
+        if os.path.exists(self.stats_path):
+            with open(self.stats_path, 'r') as f:
+                saved = json.load(f)
+            if saved.get("snapshot") == file_signature(self.path):
+                stats = CompletionStats.from_json(saved)
+        if stats is None:
+            # Stats are missing or belong to another snapshot: rebuild them once
+            stats = build_stats(self._read_snapshot(), self.reviewer)
+        for entry in itertools.chain(rotated, self._journal_entries(self.journal_path)):
+            stats.set_answered(self.reviewer, entry["paper_id"], answered_keys(entry["record"]))
+        return stats
+
+    def _write_snapshot(self, data):
+        """Atomically write the snapshot followed by the stats describing it.
+
+        The snapshot carries the question lists its records reference, so it
+        can be read without the schemas file.
+        """
+        # Built first, so the snapshot goes without matching stats for as short as possible
+        saved = build_stats(data, self.reviewer).to_json()
+        atomic_write_bytes(self.path, encode_snapshot(data, self.schemas))
+        saved["snapshot"] = file_signature(self.path)
+        atomic_write_json(self.stats_path, saved)
+
+    # --- Writing ---
+
+    def _follow_journal(self):
+        """Bring the paper versions up to date with records appended by other processes.
+
+        Called with the journal lock held. New lines are read from where this
+        process stopped; if the journal was rotated or the snapshot replaced
+        in the meantime, the versions are rebuilt from all files.
+        """
+        try:
+            stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            stat = None
+        snapshot = file_signature(self.path)
+        tail = self._tail
+        if (
+            tail is not None
+            and tail[0] == snapshot
+            and (stat is None and tail[1] is None or stat is not None and tail[1] == stat.st_ino and stat.st_size >= tail[2])
+        ):
+            if stat is None or stat.st_size == tail[2]:
+                return
+            with open(self.journal_path, 'rb') as f:
+                f.seek(tail[2])
+                chunk = f.read()
+            for line in chunk.splitlines():
+                try:
+                    entry = self._decode_entry(line)
+                except json.JSONDecodeError:
+                    continue
+                self._apply_entry(entry["paper_id"], entry["record"])
+                self._pending += 1
+            self._tail = (snapshot, stat.st_ino, tail[2] + len(chunk), chunk.endswith(b"\n"))
+            return
+
+        data = self._read_locked()
+        self._versions = {paper_id: record.get("version", 0) for paper_id, record in data.items()}
+        if stat is None:
+            self._tail = (snapshot, None, 0, True)
+        else:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(stat.st_size - 1 if stat.st_size else 0)
+                ends_with_newline = stat.st_size == 0 or f.read(1) == b"\n"
+            self._tail = (snapshot, stat.st_ino, stat.st_size, ends_with_newline)
+        if self._stats is not None:
+            self._stats = build_stats(data, self.reviewer)
+
+    def _apply_entry(self, paper_id, record):
+        self._versions[str(paper_id)] = record.get("version", 0)
+        if self._stats is not None:
+            self._stats.set_answered(self.reviewer, paper_id, answered_keys(record))
+
+    def save_paper(self, paper_id, record, base_version=None, changed=None):
+        """Append the record of a single paper to the journal.
+
+        When `base_version` (the version the record was derived from) is
+        older than the stored version, another writer saved the paper in the
+        meantime: only the answers in `changed` are taken from `record` and
+        the rest keep their stored values. Returns (version, merged).
+        """
+        paper_id = str(paper_id)
+        with self._journal_locked():
+            self._follow_journal()
+            current = self._versions.get(paper_id, 0)
+            merged = base_version is not None and changed is not None and current != base_version
+            if merged:
+                record = merge_records(self._read_locked().get(paper_id), record, changed)
+                self.conflicts += 1
+            version = max(current + 1, record.get("version", 0))
+            record = dict(record, version=version)
+            entry = {"reviewer": self.reviewer, "paper_id": paper_id, "record": encode_record(record, self.schemas)}
+            # Reopen per record so appends never land in a rotated journal
+            fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                inode = os.fstat(fd).st_ino
+                if self._journal_schemas[0] != (self._tail[0], inode):
+                    self._journal_schemas = ((self._tail[0], inode), set())
+                digest = entry["record"].get("s")
+                if digest is not None and digest not in self._journal_schemas[1]:
+                    # The first record of a question list in this journal carries the list
+                    entry["q"] = record["questions"]
+                data = dumps(entry) + b"\n"
+                if not self._tail[3]:
+                    # A crashed writer left a torn record: start on a fresh line
+                    data = b"\n" + data
+                os.write(fd, data)
+                if "q" in entry:
+                    self._journal_schemas[1].add(digest)
+            finally:
+                os.close(fd)
+            offset = self._tail[2] + len(data) if self._tail[1] == inode else len(data)
+            self._tail = (self._tail[0], inode, offset, True)
+            self._apply_entry(paper_id, record)
+            self._pending += 1
+            if self._stats is not None:
+                self._stats_version = self.version()
+        if self._pending >= self.compact_threshold:
+            self.compact_in_background()
+        return version, merged
+
+    def save_all(self, responses):
+        """Replace the whole dataset with `responses` and drop the journal.
+
+        A bulk load in one write, used to seed stores (benchmarks.app_bench);
+        the app saves paper by paper.
+        """
+        with self._compact_lock, file_lock(self.compact_lock_path), self._journal_locked():
+            self._write_snapshot(responses)
+            for path in (self.compacting_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._pending = 0
+            self._tail = None
+            self._stats = build_stats(responses, self.reviewer)
+            self._stats_version = self.version()
+
+    # --- Compaction ---
+
+    def compact(self, rewrite=False):
+        """Fold the journal into the snapshot.
+
+        The journal is first renamed aside so new appends go to a fresh file.
+        The merged snapshot is written atomically before the rotated journal
+        is removed, so a crash at any point leaves a replayable state. Only
+        one process compacts a store at a time; the others skip. With
+        `rewrite`, the snapshot is rewritten even when the journal is empty.
+        """
+        with self._compact_lock, file_lock(self.compact_lock_path, blocking=False) as acquired:
+            if not acquired:
+                return
+            self._compacting = True
+            try:
+                with self._journal_locked():
+                    if os.path.exists(self.journal_path) and not os.path.exists(self.compacting_path):
+                        os.replace(self.journal_path, self.compacting_path)
+                    self._pending = 0
+                if not os.path.exists(self.compacting_path) and not rewrite:
+                    return
+                data = self._replay(self.compacting_path, self._read_snapshot())
+                self._write_snapshot(data)
+                if os.path.exists(self.compacting_path):
+                    os.remove(self.compacting_path)
+            finally:
+                with self._journal_locked(shared=True):
+                    if self._stats is not None and self._stats_version != self.version():
+                        # The stats saved with the new snapshot plus the journal appended since
+                        self._stats = self._load_stats()
+                        self._stats_version = self.version()
+                    self._compacting = False
+
+    def compact_in_background(self):
+        """Start a compaction thread unless one is already running."""
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+        self._compact_thread = threading.Thread(
+            target=self.compact, name="responses-compactor", daemon=True
+        )
+        self._compact_thread.start()
+
+
+def shard_name(reviewer):
+    """Return the file name stem of a reviewer's shard; safe for any reviewer id."""
+    return quote(reviewer, safe="").replace(".", "%2E")
+
+
+class ShardedJournalStore:
+    """Journal stores sharded per reviewer.
+
+    The default reviewer keeps the historical responses.json; every other
+    reviewer gets its own snapshot and journal in RESPONSES_DIR. A session
+    only ever reads and appends to the shard of its reviewer, and shards have
+    independent locks, so reviewers never wait on each other. Exports and
+    admin statistics walk the shards one at a time.
+    """
+
+    lazy = False
+
+    def __init__(self, path=RESPONSES_FILE, directory=RESPONSES_DIR, compact_threshold=COMPACT_THRESHOLD):
+        self.path = path
+        self.directory = directory
+        self.compact_threshold = compact_threshold
+        self._shards = {}
+        self._shards_lock = threading.Lock()
+        self._merged_stats = None
+
+    def shard_path(self, reviewer):
+        if reviewer == DEFAULT_REVIEWER:
+            return self.path
+        return os.path.join(self.directory, shard_name(reviewer) + SHARD_EXTENSION)
+
+    def shard(self, reviewer):
+        """Return the store holding the responses of `reviewer`."""
+        with self._shards_lock:
+            store = self._shards.get(reviewer)
+            if store is None:
+                if reviewer != DEFAULT_REVIEWER:
+                    os.makedirs(self.directory, exist_ok=True)
+                store = JournalStore(self.shard_path(reviewer), self.compact_threshold, reviewer)
+                self._shards[reviewer] = store
+            return store
+
+    def reviewers(self):
+        """Return the reviewers that have a shard on disk, default reviewer first."""
+        found = set()
+        if any(os.path.exists(self.path + suffix) for suffix in ("", JOURNAL_SUFFIX, JOURNAL_SUFFIX + COMPACTING_SUFFIX)):
+            found.add(DEFAULT_REVIEWER)
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                stem, extension, _ = name.partition(SHARD_EXTENSION)
+                if extension and stem and not name.startswith("."):
+                    found.add(unquote(stem))
+        return sorted(found, key=lambda reviewer: (reviewer != DEFAULT_REVIEWER, reviewer))
+
+    # --- Reading ---
+
+    def load_all(self, reviewer=DEFAULT_REVIEWER):
+        return self.shard(reviewer).load_all()
+
+    def load_paper(self, paper_id, reviewer=DEFAULT_REVIEWER):
+        return self.shard(reviewer).load_paper(paper_id)
+
+    def iter_records(self):
+        """Yield (reviewer, paper_id, record) shard by shard, holding one shard in memory at a time."""
+        for reviewer in self.reviewers():
+            yield from self.shard(reviewer).iter_records()
+
+    def version(self):
+        """Return a value that changes whenever any shard changes."""
+        return tuple((reviewer, self.shard(reviewer).version()) for reviewer in self.reviewers())
+
+    # --- Statistics ---
+
+    def stats_for(self, reviewer):
+        """Completion statistics of a single reviewer's shard."""
+        return self.shard(reviewer).stats
+
+    @property
+    def stats(self):
+        """Completion statistics summed across all shards, re-summed when a shard changes."""
+        version = self.version()
+        merged = self._merged_stats
+        if merged is None or merged[0] != version:
+            stats = MergedStats({reviewer: self.stats_for(reviewer) for reviewer in self.reviewers()})
+            merged = self._merged_stats = (version, stats)
+        return merged[1]
+
+    # --- Writing ---
+
+    def save_paper(self, paper_id, record, reviewer=DEFAULT_REVIEWER, base_version=None, changed=None):
+        return self.shard(reviewer).save_paper(paper_id, record, base_version, changed)
+
+    def save_all(self, responses, reviewer=DEFAULT_REVIEWER):
+        """Replace every record of `reviewer` with `responses`; a bulk load, see JournalStore.save_all."""
+        self.shard(reviewer).save_all(responses)
+
+
+class SQLiteStore:
+    """Response store backed by an SQLite database in WAL mode.
+
+    Answers are kept one row per (reviewer, paper_id, question_id), so a save
+    only upserts the rows of one paper and a paper can be loaded on its own.
+    Completion statistics are derived from the persisted `answered` flags,
+    kept current by each save of this process and rebuilt when another
+    process changed the database. Paper rows carry the same version stamps as
+    the journal store, checked inside the write transaction.
+    """
+
+    lazy = True
+
+    def __init__(self, path=RESPONSES_DB):
+        self.path = path
+        self._local = threading.local()
+        self._stats = None
+        self._stats_version = None
+        self._stats_lock = threading.Lock()
+        self._init_schema()
+
+    def stats_for(self, reviewer):
+        """Completion statistics covering `reviewer`; the table holds every reviewer at once."""
+        return self.stats
+
+    @property
+    def stats(self):
+        """Completion statistics, rebuilt from the answers table when another process wrote to it."""
+        with self._stats_lock:
+            version = self.version()
+            if self._stats is None or self._stats_version != version:
+                self._stats = self._load_stats()
+                self._stats_version = version
+            return self._stats
+
+    def _load_stats(self):
+        conn = self._connect()
+        stats = CompletionStats()
+        # One row per paper with its answered question ids joined by a unit separator
+        papers = conn.execute(
+            """
+            SELECT p.reviewer, p.paper_id, p.questions, group_concat(a.question_id, char(31))
+            FROM papers p
+            LEFT JOIN answers a
+                ON a.reviewer = p.reviewer AND a.paper_id = p.paper_id AND a.answered = 1
+            GROUP BY p.reviewer, p.paper_id
+            """
+        )
+        for reviewer, paper_id, questions, answered in papers:
+            categories = question_categories({"questions": json.loads(questions) if questions else []})
+            stats.set_answered(reviewer, paper_id, {
+                q_id: categories.get(q_id, "general") for q_id in (answered.split("\x1f") if answered else ())
+            })
+        return stats
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS papers (
+                    reviewer TEXT NOT NULL,
+                    paper_id TEXT NOT NULL,
+                    paper_title TEXT,
+                    questions TEXT,
+                    timestamp TEXT,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (reviewer, paper_id)
+                );
+                CREATE TABLE IF NOT EXISTS answers (
+                    reviewer TEXT NOT NULL,
+                    paper_id TEXT NOT NULL,
+                    question_id TEXT NOT NULL,
+                    value TEXT,
+                    answered INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (reviewer, paper_id, question_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_answers_paper
+                    ON answers (paper_id, question_id);
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(papers)")}
+            if "version" not in columns:
+                # Databases created before version stamps were introduced
+                conn.execute("ALTER TABLE papers ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    # --- Reading ---
+
+    def _build_record(self, conn, reviewer, row):
+        paper_id, paper_title, questions, timestamp, completed, version = row
+        answers = conn.execute(
+            "SELECT question_id, value FROM answers WHERE reviewer = ? AND paper_id = ?",
+            (reviewer, paper_id),
+        )
+        return {
+            "paper_id": _restore_paper_id(paper_id),
+            "paper_title": paper_title,
+            "responses": {q_id: json.loads(value) for q_id, value in answers},
+            "questions": json.loads(questions) if questions else [],
+            "timestamp": timestamp,
+            "completed": bool(completed),
+            "version": version,
+        }
+
+    def load_all(self, reviewer=DEFAULT_REVIEWER):
+        """Return every paper record of `reviewer`."""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT paper_id, paper_title, questions, timestamp, completed, version "
+            "FROM papers WHERE reviewer = ?",
+            (reviewer,),
+        ).fetchall()
+        return {row[0]: self._build_record(conn, reviewer, row) for row in rows}
+
+    def load_paper(self, paper_id, reviewer=DEFAULT_REVIEWER):
+        """Return the record for one paper, or None if it has no responses."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT paper_id, paper_title, questions, timestamp, completed, version "
+            "FROM papers WHERE reviewer = ? AND paper_id = ?",
+            (reviewer, str(paper_id)),
+        ).fetchone()
+        if row is None:
+            return None
+        return self._build_record(conn, reviewer, row)
+
+    def version(self):
+        """Return a value that changes whenever the stored responses change."""
+        return (file_signature(self.path), file_signature(self.path + "-wal"))
+
+    def iter_records(self):
+        """Yield (reviewer, paper_id, record) one paper at a time across all reviewers."""
+        conn = self._connect()
+        papers = conn.execute(
+            "SELECT reviewer, paper_id, paper_title, questions, timestamp, completed, version "
+            "FROM papers ORDER BY reviewer, paper_id"
+        )
+        for reviewer, *row in papers:
+            yield reviewer, row[0], self._build_record(conn, reviewer, row)
+
+    # --- Writing ---
+
+    def _upsert(self, conn, reviewer, paper_id, record):
+        conn.execute(
+            """
+            INSERT INTO papers (reviewer, paper_id, paper_title, questions, timestamp, completed, version)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (reviewer, paper_id) DO UPDATE SET
+                paper_title = excluded.paper_title,
+                questions = excluded.questions,
+                timestamp = excluded.timestamp,
+                completed = excluded.completed,
+                version = excluded.version
+            """,
+            (
+                reviewer,
+                str(paper_id),
+                record.get("paper_title"),
+                json.dumps(record.get("questions", [])),
+                record.get("timestamp"),
+                int(bool(record.get("completed"))),
+                record.get("version", 0),
+            ),
+        )
+        conn.executemany(
+            """
+            INSERT INTO answers (reviewer, paper_id, question_id, value, answered)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (reviewer, paper_id, question_id) DO UPDATE SET
+                value = excluded.value,
+                answered = excluded.answered
+            """,
+            [
+                (reviewer, str(paper_id), str(q_id), json.dumps(value), int(is_answered(value)))
+                for q_id, value in record.get("responses", {}).items()
+            ],
+        )
+
+    def save_paper(self, paper_id, record, reviewer=DEFAULT_REVIEWER, base_version=None, changed=None):
+        """Upsert the rows of a single paper in one transaction.
+
+        Conflicts are handled as in JournalStore.save_paper, which this
+        mirrors. Returns (version, merged).
+        """
+        conn = self._connect()
+        with conn:
+            # Take the write lock up front so the version check and the upsert are atomic
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT version FROM papers WHERE reviewer = ? AND paper_id = ?",
+                (reviewer, str(paper_id)),
+            ).fetchone()
+            current = row[0] if row else 0
+            # Statistics that were current stay so once this save is applied to them
+            stats_current = self._stats is not None and self._stats_version == self.version()
+            merged = base_version is not None and changed is not None and current != base_version
+            if merged:
+                record = merge_records(self.load_paper(paper_id, reviewer), record, changed)
+            version = max(current + 1, record.get("version", 0))
+            record = dict(record, version=version)
+            self._upsert(conn, reviewer, paper_id, record)
+        with self._stats_lock:
+            if self._stats is not None:
+                self._stats.set_answered(reviewer, paper_id, answered_keys(record))
+                if stats_current:
+                    self._stats_version = self.version()
+        return version, merged
+
+    def save_many(self, responses, reviewer=DEFAULT_REVIEWER):
+        """Upsert several paper records in one transaction."""
+        with self._connect() as conn:
+            for paper_id, record in responses.items():
+                self._upsert(conn, reviewer, paper_id, record)
+        self._stats = None
+
+    def save_all(self, responses, reviewer=DEFAULT_REVIEWER):
+        """Replace every record of `reviewer` with `responses`; a bulk load, see JournalStore.save_all."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM answers WHERE reviewer = ?", (reviewer,))
+            conn.execute("DELETE FROM papers WHERE reviewer = ?", (reviewer,))
+            for paper_id, record in responses.items():
+                self._upsert(conn, reviewer, paper_id, record)
+        self._stats = None
+
+
+def _restore_paper_id(paper_id):
+    """Paper ids are stored as text; give numeric ids back their int type."""
+    return int(paper_id) if paper_id.isdigit() else paper_id
+
+
+def create_store(kind=None):
+    """Create the response store selected by `kind` or the RESPONSE_STORE env var."""
+    kind = kind or os.environ.get("RESPONSE_STORE", "journal")
+    if kind == "journal":
+        return ShardedJournalStore(RESPONSES_FILE, RESPONSES_DIR)
+    if kind == "sqlite":
+        return SQLiteStore(RESPONSES_DB)
+    raise ValueError(f"Unknown response store: {kind!r}")
@@ -1,5 +1,22 @@
+import os
 import streamlit as st
-from modules.config import get_questions_for_paper
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from modules.config import get_question_schema, get_papers_by_id
+from modules.data_handler import get_answered_count, get_reviewer_stats
+from modules.metrics import fragment_reruns, timed
+from modules.pdf_viewer import get_paper_preview
+from modules.search_index import SEARCH_DB, SearchIndex
+
+# Catalogs larger than this get a filterable, paged sidebar
+SIDEBAR_PAGE_SIZE = 25
+# Width of the first-page thumbnails shown in the sidebar
+SIDEBAR_THUMBNAIL_WIDTH = 120
+STATUS_FILTERS = {
+    "All": None,
+    "⚪ Not started": "⚪",
+    "📝 In progress": "📝",
+    "✅ Completed": "✅",
+}
 
 def inject_custom_css():
     """Injects custom CSS to override default Streamlit styles."""
@@ -55,14 +72,23 @@ def inject_custom_css():
         </style>
     """, unsafe_allow_html=True)
 
-def get_paper_status_icon(paper_id, all_questions):
-    """Returns a status icon based on the paper's review progress."""
-    if str(paper_id) not in st.session_state.responses:
-        return "⚪"
-    
-    paper_data = st.session_state.responses[str(paper_id)]
-    responses = paper_data.get("responses", {})
-    answered_count = len([r for r in responses.values() if r and str(r).strip()])
+def is_fragment_rerun():
+    """Return True while a fragment reruns on its own, without the rest of the app."""
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+def select_paper(paper_id):
+    """Open a paper. Clicked in the sidebar fragment, this reruns the whole app."""
+    st.session_state.current_paper_id = paper_id
+    if is_fragment_rerun():
+        st.rerun()
+
+def get_paper_status_icon(paper_id, all_questions, stats=None):
+    """Returns a status icon based on the paper's review progress.
+
+    `stats` is passed on to get_answered_count().
+    """
+    answered_count = get_answered_count(paper_id, stats)
 
     if answered_count == 0:
         return "⚪"
@@ -71,22 +97,124 @@ def get_paper_status_icon(paper_id, all_questions):
     else:
         return "📝"
 
+def sidebar_status_stale(paper_id, all_questions):
+    """Return True if the sidebar shows a paper with another status than it has now."""
+    shown = st.session_state.get('sidebar_icons', {}).get(str(paper_id))
+    return shown is not None and shown != get_paper_status_icon(paper_id, all_questions)
+
+@st.cache_resource
+def get_search_index():
+    """Return the full-text search index shared by all sessions."""
+    return SearchIndex(SEARCH_DB)
+
+def render_search_box(papers):
+    """Renders a full-text search box whose hits open the paper at the matching page."""
+    if not os.path.exists(SEARCH_DB):
+        return
+
+    query = st.sidebar.text_input(
+        "🔍 Search papers",
+        key="paper_search",
+        placeholder="Search the full text..."
+    )
+    if not query.strip():
+        return
+
+    papers_by_id = {str(p['id']): p for p in papers}
+    results = [r for r in get_search_index().search(query, limit=10) if r['paper_id'] in papers_by_id]
+    if not results:
+        st.sidebar.caption("No matching papers.")
+        return
+
+    for result in results:
+        paper = papers_by_id[result['paper_id']]
+        pages = ", ".join(str(p) for p in result['pages'][:5])
+        if st.sidebar.button(f"{paper['title']} (p. {pages})", key=f"search_hit_{paper['id']}", use_container_width=True):
+            st.session_state[f"pdf_page_{paper['id']}"] = result['pages'][0]
+            select_paper(paper['id'])
+        st.sidebar.caption(result['snippet'])
+    st.sidebar.markdown("---")
+
+def render_paper_filters(papers, all_questions, stats):
+    """Renders status/title filters and paging; returns the visible (index, paper, icon) entries."""
+    status_col, prefix_col = st.sidebar.columns(2)
+    with status_col:
+        status_label = st.selectbox("Status", list(STATUS_FILTERS), key="paper_status_filter")
+    with prefix_col:
+        prefix = st.text_input("Title starts with", key="paper_title_filter").strip().lower()
+
+    wanted_icon = STATUS_FILTERS[status_label]
+    matches = []
+    for i, paper in enumerate(papers):
+        if prefix and not paper['title'].lower().startswith(prefix):
+            continue
+        icon = get_paper_status_icon(paper['id'], all_questions, stats)
+        if wanted_icon and icon != wanted_icon:
+            continue
+        matches.append((i, paper, icon))
+
+    page_count = max((len(matches) + SIDEBAR_PAGE_SIZE - 1) // SIDEBAR_PAGE_SIZE, 1)
+    if st.session_state.get("paper_list_page", 1) > page_count:
+        st.session_state.paper_list_page = page_count
+    page = st.sidebar.number_input(
+        f"Page (of {page_count})",
+        min_value=1,
+        max_value=page_count,
+        key="paper_list_page"
+    ) if page_count > 1 else 1
+    st.sidebar.caption(f"{len(matches)} of {len(papers)} papers")
+
+    start = (page - 1) * SIDEBAR_PAGE_SIZE
+    return matches[start:start + SIDEBAR_PAGE_SIZE]
+
+def preview_tooltip(preview):
+    """Return the hover text of a paper button: page count and opening text."""
+    if preview is None or preview[0]["error"]:
+        return None
+    pages = preview[0]["pages"]
+    lines = [f"**{pages} page{'s' if pages != 1 else ''}**"] if pages else []
+    if preview[0]["snippet"]:
+        lines.append(preview[0]["snippet"] + "…")
+    return "\n\n".join(lines) or None
+
+@st.fragment
+@fragment_reruns
+@timed("render_sidebar")
 def render_sidebar(papers, question_templates):
     """Renders the sidebar for paper selection on the main page."""
     st.sidebar.markdown("## 📝 Select a Paper")
     st.sidebar.markdown("---")
+    render_search_box(papers)
     
     selected_paper = None
+    all_questions = get_question_schema(question_templates).questions
+    stats = get_reviewer_stats()
     
-    for i, paper in enumerate(papers):
-        all_questions_for_paper = get_questions_for_paper(paper['id'], question_templates)
-        icon = get_paper_status_icon(paper['id'], all_questions_for_paper)
-        
-        if st.sidebar.button(f"{i + 1}. {icon} {paper['title']}", key=f"paper_btn_{paper['id']}", use_container_width=True):
-            st.session_state.current_paper_id = paper['id']
+    if len(papers) > SIDEBAR_PAGE_SIZE:
+        visible_papers = render_paper_filters(papers, all_questions, stats)
+    else:
+        visible_papers = [
+            (i, paper, get_paper_status_icon(paper['id'], all_questions, stats))
+            for i, paper in enumerate(papers)
+        ]
+    
+    # Statuses as drawn, so fragments can tell when the sidebar is out of date
+    st.session_state.sidebar_icons = {str(paper['id']): icon for _, paper, icon in visible_papers}
+    show_thumbnails = st.sidebar.toggle("🖼️ Show previews", key="sidebar_previews")
+    for i, paper, icon in visible_papers:
+        preview = get_paper_preview(paper)
+        if st.sidebar.button(
+            f"{i + 1}. {icon} {paper['title']}",
+            key=f"paper_btn_{paper['id']}",
+            help=preview_tooltip(preview),
+            use_container_width=True,
+        ):
+            select_paper(paper['id'])
+        if show_thumbnails and preview and preview[1]:
+            st.sidebar.image(preview[1], width=SIDEBAR_THUMBNAIL_WIDTH)
     
     if st.session_state.get('current_paper_id'):
-        selected_paper = next((p for p in papers if p['id'] == st.session_state.current_paper_id), None)
+        selected_paper = get_papers_by_id(papers).get(st.session_state.current_paper_id)
 
     return selected_paper
 
@@ -100,13 +228,18 @@ def render_progress_bar(progress, answered, total):
     with col2:
         st.markdown(f"**{answered}/{total}** answered")
 
+def mark_question_set(key):
+    """Widget callback: remember that the reviewer set the question of widget `key`."""
+    st.session_state[f"{key}_set"] = True
+
+@timed("render_question")
 def render_question(question, saved_value, paper_id):
-    """Render a single question based on its type."""
+    """Render a single question based on its type; None if it has no saved or entered answer."""
     q_id = question['id']
     q_text = question['text']
     q_type = question['type']
     
-    key = f"paper_{paper_id}_q_{q_id}"
+    key = f"paper_{paper_id}_{question['response_key']}"
     
     st.markdown(f"**Q{q_id + 1}:** {q_text}")
     
@@ -119,21 +252,23 @@ def render_question(question, saved_value, paper_id):
             height=100,
             key=key,
             placeholder="Enter your response...",
-            label_visibility="collapsed"
+            label_visibility="collapsed",
+            on_change=mark_question_set,
+            args=(key,)
         )
     elif q_type == "multiple_choice":
         options = question.get('options', [])
-        # Ensure saved_value is valid before finding its index
-        try:
-            default_idx = options.index(saved_value) if saved_value in options else 0
-        except ValueError:
-            default_idx = 0
+        # Unanswered questions show no option, so choosing the first one is an answer too
+        default_idx = options.index(saved_value) if saved_value in options else None
         response = st.selectbox(
             q_text,
-            options=options,
+            options=list(options),
             index=default_idx,
             key=key,
-            label_visibility="collapsed"
+            placeholder="Choose an option...",
+            label_visibility="collapsed",
+            on_change=mark_question_set,
+            args=(key,)
         )
     elif q_type == "rating":
         min_val = question.get('min', 1)
@@ -146,8 +281,13 @@ def render_question(question, saved_value, paper_id):
             max_value=max_val,
             value=default_val,
             key=key,
-            label_visibility="collapsed"
+            label_visibility="collapsed",
+            on_change=mark_question_set,
+            args=(key,)
         )
 
     st.markdown("<br>", unsafe_allow_html=True)
+    # The widget defaults shown for an unanswered question are not answers
+    if saved_value is None and not st.session_state.get(f"{key}_set"):
+        return None
     return response
\ No newline at end of file
@@ -1,42 +1,13 @@
 import streamlit as st
-import time
-from modules.data_handler import export_responses, load_all_responses_from_disk
-
-def check_password():
-    """Returns `True` if the user is logged in, `False` otherwise."""
-    # If the user is already logged in, return True
-    if st.session_state.get("admin_logged_in"):
-        return True
-
-    # --- Login Form ---
-    st.title("🔒 Admin Panel Login")
-    st.markdown("---")
-    
-    try:
-        # Get credentials from Streamlit secrets
-        admin_username = st.secrets["admin_credentials"]["username"]
-        admin_password = st.secrets["admin_credentials"]["password"]
-    except (KeyError, FileNotFoundError):
-        st.error(
-            "Admin credentials are not configured. "
-            "Please create a `.streamlit/secrets.toml` file."
-        )
-        return False
-
-    username = st.text_input("Username", key="admin_user")
-    password = st.text_input("Password", type="password", key="admin_pass")
-
-    if st.button("Login", key="admin_login_btn"):
-        if username == admin_username and password == admin_password:
-            st.session_state["admin_logged_in"] = True
-            # Rerun the script to reflect the new login state
-            st.rerun()
-        else:
-            st.error("The username or password you entered is incorrect.")
-            # Simple delay to mitigate brute-force attacks
-            time.sleep(1)
-    
-    return False
+from modules.auth import check_password
+from modules.config import load_config, get_question_schema
+from modules.data_handler import (
+    export_responses,
+    get_autosave_writer,
+    get_completion_stats,
+    get_write_stats
+)
+from modules.pdf_viewer import get_memory_pdf_cache
 
 def show_admin_panel():
     """Displays the main content of the admin panel."""
@@ -44,21 +15,53 @@ def show_admin_panel():
     st.markdown("---")
     st.header("Export All User Responses")
 
-    all_responses = load_all_responses_from_disk()
+    stats = get_completion_stats()
 
-    if all_responses:
-        num_papers = len(all_responses)
-        total_responses = sum(
-            len([v for v in data.get("responses", {}).values() if v and str(v).strip()]) 
-            for data in all_responses.values()
+    if stats.paper_records():
+        st.success(
+            f"Found responses for **{stats.paper_records()}** paper(s) from **{stats.reviewer_count()}** reviewer(s) "
+            f"with a total of **{stats.total}** answered questions."
         )
+        if stats.by_category:
+            st.caption(" · ".join(
+                f"{category.capitalize()}: {count}" for category, count in stats.by_category.items()
+            ))
         
-        st.success(f"Found responses for **{num_papers}** paper(s) with a total of **{total_responses}** answered questions.")
-        
-        export_responses(all_responses)
+        config = load_config()
+        export_responses(get_question_schema(config.get("question_templates", {})).questions)
 
     else:
-        st.warning("No responses found in `responses.json`. The file is either empty or does not exist.")
+        st.warning("No responses found. No reviewer has saved any answers yet.")
+
+    st.header("Storage Activity")
+    write_stats = get_write_stats()
+    col1, col2 = st.columns(2)
+    col1.metric("Saves with changes", write_stats.written)
+    col2.metric("Saves avoided (unchanged)", write_stats.skipped)
+
+    autosave = get_autosave_writer().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Autosave queue depth", autosave["queue_depth"])
+    col2.metric("Oldest unsaved change", f"{autosave['oldest_pending']:.1f} s")
+    col3.metric("Last write lag", f"{autosave['last_lag']:.1f} s")
+    col4.metric("Records written", autosave["written"])
+    st.caption(
+        f"{autosave['coalesced']} change(s) merged into a pending write; "
+        f"{autosave['merged']} write(s) merged with answers saved by another session or server; "
+        f"longest write lag {autosave['max_lag']:.1f} s."
+    )
+    if autosave["failed"]:
+        st.error(f"{autosave['failed']} autosave write(s) failed. Last error: {autosave['last_error']}")
+
+    pdf_stats = get_memory_pdf_cache().stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("PDF memory cache hits", pdf_stats["hits"])
+    col2.metric("PDF memory cache misses", pdf_stats["misses"])
+    col3.metric("PDF MB served", f"{pdf_stats['bytes_served'] / 1024 ** 2:.1f}")
+    st.caption(
+        f"{pdf_stats['entries']} PDF(s) held in memory ({pdf_stats['bytes_cached'] / 1024 ** 2:.1f} MB). "
+        "Counters cover this server process since it started."
+    )
 
 # --- Main App Logic ---
 st.set_page_config(
@@ -0,0 +1,79 @@
+import streamlit as st
+from modules.analytics import (
+    answers_frame,
+    completion_funnel,
+    option_frequencies,
+    rating_distribution,
+    reviewer_agreement
+)
+from modules.auth import check_password
+from modules.config import CONFIG_PATH, load_config, get_question_schema
+from modules.data_handler import get_response_store
+from modules.storage import file_signature
+
+@st.cache_resource(max_entries=2, show_spinner="Loading responses...")
+def load_answers_frame(store_version, config_signature, _store, _questions):
+    """Builds the answers DataFrame once per version of the response store and config."""
+    return answers_frame(_store.iter_records(), _questions)
+
+def show_analytics():
+    """Displays aggregate charts over every stored response."""
+    st.title("📊 Response Analytics")
+    st.markdown("---")
+
+    store = get_response_store()
+    config = load_config()
+    questions = get_question_schema(config.get("question_templates", {})).questions
+    frame = load_answers_frame(store.version(), file_signature(CONFIG_PATH), store, questions)
+
+    if frame.empty:
+        st.warning("No responses have been saved yet.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Reviewers", frame["reviewer"].nunique())
+    col2.metric("Papers reviewed", frame["paper_id"].nunique())
+    col3.metric("Answered questions", int(frame["answered"].sum()))
+
+    question_text = {q["id"]: q["text"] for q in questions}
+
+    st.header("Completion by Category")
+    st.dataframe(completion_funnel(frame, questions))
+
+    st.header("Rating Distributions")
+    ratings = rating_distribution(frame)
+    if ratings.empty:
+        st.info("No ratings yet.")
+    for question_id, counts in ratings.iterrows():
+        st.subheader(question_text.get(question_id, f"Question {question_id}"))
+        st.bar_chart(counts.rename("responses"))
+
+    st.header("Multiple-Choice Answers")
+    choices = option_frequencies(frame)
+    if choices.empty:
+        st.info("No multiple-choice answers yet.")
+    for question_id, rows in choices.groupby("question_id", observed=True):
+        st.subheader(question_text.get(question_id, f"Question {question_id}"))
+        st.dataframe(
+            rows[["answer", "count", "share"]],
+            hide_index=True,
+            column_config={"share": st.column_config.ProgressColumn("share", min_value=0.0, max_value=1.0)},
+        )
+
+    st.header("Inter-Reviewer Agreement")
+    agreement = reviewer_agreement(frame)
+    if agreement.empty:
+        st.info("Agreement needs papers answered by at least two reviewers.")
+    else:
+        agreement.insert(0, "question", agreement.index.map(lambda q: question_text.get(q, str(q))))
+        st.dataframe(agreement, hide_index=True)
+        st.caption("Share of reviewer pairs that gave the same answer on the same paper.")
+
+# --- Main App Logic ---
+st.set_page_config(
+    page_title="Analytics",
+    layout="wide"
+)
+
+if check_password("🔒 Analytics Login"):
+    show_analytics()
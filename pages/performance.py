@@ -0,0 +1,101 @@
+import pandas as pd
+import streamlit as st
+from modules.auth import check_password
+from modules.metrics import METRICS_ENABLED, METRICS_FILE, registry, request_profile
+
+def ratio(hits, total):
+    return f"{hits / total:.0%}" if total else "–"
+
+def show_latency():
+    """Displays per-stage latency percentiles and bytes sent per rerun."""
+    summary = registry.summary()
+    stages = {name: values for name, values in summary.items() if name != "rerun_sent_bytes"}
+    if not stages:
+        st.info("No reruns have been recorded yet. Open the review app to collect timings.")
+        return
+
+    table = pd.DataFrame.from_dict(stages, orient="index").sort_values("p95", ascending=False)
+    latency_columns = ["mean", "p50", "p95", "p99"]
+    table[latency_columns] = table[latency_columns] * 1000
+    st.dataframe(
+        table.rename(columns={col: f"{col} (ms)" for col in latency_columns}),
+        column_config={"count": st.column_config.NumberColumn("calls")},
+    )
+
+    sent = summary.get("rerun_sent_bytes")
+    if sent:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("KB sent per rerun (p50)", f"{sent['p50'] / 1024:.1f}")
+        col2.metric("KB sent per rerun (p95)", f"{sent['p95'] / 1024:.1f}")
+        col3.metric("KB sent per rerun (p99)", f"{sent['p99'] / 1024:.1f}")
+
+def show_caches():
+    """Displays PDF cache hit rates, PDF download queue and autosave health."""
+    collected = registry.collect()
+    memory = collected.get("pdf_memory_cache", {})
+    disk = collected.get("pdf_disk_cache", {})
+    autosave = collected.get("autosave", {})
+    fetcher = collected.get("pdf_fetcher", {})
+
+    col1, col2, col3, col4 = st.columns(4)
+    memory_total = memory.get("hits", 0) + memory.get("misses", 0)
+    col1.metric("PDF memory cache hit rate", ratio(memory.get("hits", 0), memory_total), f"{memory_total} reads", delta_color="off")
+    disk_total = sum(disk.values())
+    disk_hits = disk.get("fresh", 0) + disk.get("revalidated", 0) + disk.get("offline", 0)
+    col2.metric("PDF disk cache hit rate", ratio(disk_hits, disk_total), f"{disk_total} fetches", delta_color="off")
+    col3.metric("PDF downloads queued", fetcher.get("queue_depth", 0), f"{fetcher.get('failures_cached', 0)} failing URLs", delta_color="off")
+    col4.metric("Autosave queue depth", autosave.get("queue_depth", 0))
+
+def show_profiling():
+    """Displays the rerun profiler controls and captured profiles."""
+    if st.button("Profile the next rerun", key="request_profile_btn"):
+        request_profile()
+        st.success("The next rerun of the review app, in any session, will be profiled.")
+    elif registry.profile_requested:
+        st.caption("Waiting for the next rerun of the review app...")
+
+    for i, profile in enumerate(registry.profiles):
+        with st.expander(f"{profile['captured_at']} · {profile['script']} · {profile['duration'] * 1000:.0f} ms", expanded=i == 0):
+            st.download_button(
+                "Download .prof",
+                data=profile["pstats"],
+                file_name=f"rerun_{profile['captured_at'].replace(' ', '_').replace(':', '')}.prof",
+                mime="application/octet-stream",
+                key=f"profile_download_{i}",
+            )
+            st.code(profile["report"], language=None)
+
+def show_performance():
+    """Displays the main content of the performance dashboard."""
+    st.title("⏱️ Performance")
+    st.markdown("---")
+
+    if not METRICS_ENABLED:
+        st.warning("Instrumentation is disabled (`APP_METRICS=0`).")
+        return
+
+    st.header("Rerun Latency")
+    show_latency()
+
+    st.header("Caches")
+    show_caches()
+
+    st.header("Profiling")
+    show_profiling()
+
+    st.header("Prometheus")
+    st.caption(
+        f"Written to `{METRICS_FILE}` at most every few seconds; with static serving enabled it is "
+        "served at `app/static/metrics.txt`. Counters cover this server process since it started."
+    )
+    with st.expander("Current metrics"):
+        st.code(registry.to_prometheus(), language=None)
+
+# --- Main App Logic ---
+st.set_page_config(
+    page_title="Performance",
+    layout="wide"
+)
+
+if check_password("🔒 Performance Login"):
+    show_performance()
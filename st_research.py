@@ -1,9 +1,53 @@
 import streamlit as st
+from modules.auth import reviewer_login
+from modules.metrics import begin_rerun, end_rerun, fragment_reruns
 from modules.config import load_config
-from modules.ui_components import inject_custom_css, render_sidebar, render_question, render_progress_bar
+from modules.ui_components import (
+    inject_custom_css,
+    is_fragment_rerun,
+    sidebar_status_stale,
+    render_sidebar,
+    render_question,
+    render_progress_bar
+)
 from modules.pdf_viewer import render_pdf_viewer
-from modules.data_handler import save_responses, load_responses, load_all_responses_from_disk, save_all_responses_to_disk
-from modules.config import get_questions_for_paper
+from modules.data_handler import save_responses, load_responses, get_answered_count, init_session_responses, save_paper_responses_to_disk
+from modules.config import get_question_schema
+
+# --- Question Pane ---
+@st.fragment
+@fragment_reruns
+def render_question_pane(paper, question_schema):
+    """Renders the progress bar and questions of a paper and queues changed answers."""
+    all_questions = question_schema.questions
+    loaded_responses = load_responses(paper['id'], key_prefix="q_")
+
+    # --- Progress Bar ---
+    answered_count = get_answered_count(paper['id'])
+    total_questions = len(all_questions)
+    progress = (answered_count / total_questions) if total_questions > 0 else 0
+    render_progress_bar(progress, answered_count, total_questions)
+    st.markdown("---")
+
+    # --- Render Questions and Capture Responses ---
+    current_responses = {}
+    for category, category_questions in question_schema.questions_by_category.items():
+        if category_questions:
+            with st.expander(f"**{category.capitalize()}**", expanded=True):
+                for q in category_questions:
+                    q_key = q['response_key']
+                    saved_value = loaded_responses.get(q_key)
+                    response = render_question(q, saved_value, paper['id'])
+                    if response is not None:
+                        current_responses[q_key] = response
+
+    # --- Save responses and write to disk ---
+    save_responses(paper, current_responses, all_questions)
+    save_paper_responses_to_disk(paper['id'])
+
+    # The sidebar shows each paper's status but is not redrawn by this fragment
+    if is_fragment_rerun() and sidebar_status_stale(paper['id'], all_questions):
+        st.rerun()
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -11,10 +55,15 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+begin_rerun()
 
 # --- Custom CSS ---
 inject_custom_css()
 
+# --- Reviewer Identity ---
+if reviewer_login() is None:
+    st.stop()
+
 # --- Load Configuration ---
 config = load_config()
 papers = config.get("papers", [])
@@ -22,7 +71,7 @@ question_templates = config.get("question_templates", {})
 
 # --- Initialize Session State ---
 if 'responses' not in st.session_state:
-    st.session_state.responses = load_all_responses_from_disk()
+    st.session_state.responses = init_session_responses()
 if 'current_paper_id' not in st.session_state:
     st.session_state.current_paper_id = None
 
@@ -64,29 +113,8 @@ else:
         st.subheader("📝 Review Questions")
         st.markdown("---")
         
-        all_questions = get_questions_for_paper(selected_paper['id'], question_templates)
-        loaded_responses = load_responses(selected_paper['id'])
-        
-        # --- Progress Bar ---
-        answered_count = len([r for r in loaded_responses.values() if r and str(r).strip()])
-        total_questions = len(all_questions)
-        progress = (answered_count / total_questions) if total_questions > 0 else 0
-        render_progress_bar(progress, answered_count, total_questions)
-        st.markdown("---")
-        
-        # --- Render Questions and Capture Responses ---
-        current_responses = {}
-        for category in question_templates.keys():
-            category_questions = [q for q in all_questions if q['category'] == category]
-            if category_questions:
-                with st.expander(f"**{category.capitalize()}**", expanded=True):
-                    for q in category_questions:
-                        q_key = f"q_{q['id']}"
-                        saved_value = loaded_responses.get(q_key)
-                        response = render_question(q, saved_value, selected_paper['id'])
-                        current_responses[q_key] = response
+        render_question_pane(selected_paper, get_question_schema(question_templates))
+        st.markdown('</div>', unsafe_allow_html=True)
 
-        # --- Save responses and write to disk ---
-        save_responses(selected_paper, current_responses, all_questions)
-        save_all_responses_to_disk(st.session_state.responses)
-        st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
+# --- Record rerun metrics ---
+end_rerun()